@@ -1,10 +1,18 @@
 """Configuration for the LLM Council."""
 
 import os
+import sys
 import json
+from dataclasses import dataclass
 from dotenv import load_dotenv
 
-load_dotenv()
+from .json_codec import json_dumps, json_loads
+
+# Never override variables already set in the process environment
+load_dotenv(override=False)
+
+# Secrets are read once at import; other modules import these constants
+# rather than calling os.getenv() themselves.
 
 # OpenRouter API key
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
@@ -33,49 +41,101 @@ OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 # Data directory for conversation storage
 DATA_DIR = "data/conversations"
 
+# Directory for per-job streaming event logs (used for reconnect replay)
+JOBS_DIR = "data/jobs"
+
+# "job_id,conversation_id" lines for jobs started since the last restart,
+# so startup recovery only has to inspect those conversations
+PENDING_JOBS_LOG = "data/pending_jobs.log"
+
 # Config file for persistent settings
 CONFIG_FILE = "data/config.json"
 
 # --- Dynamic config ---
 
-_active_config = {
-    "council_models": list(DEFAULT_COUNCIL_MODELS),
-    "chairman_model": DEFAULT_CHAIRMAN_MODEL,
-}
+@dataclass(frozen=True, slots=True)
+class _ActiveConfig:
+    """Immutable snapshot of the runtime council configuration."""
+    council_models: tuple
+    chairman_model: str
+
+
+def _make_config(council_models, chairman_model) -> _ActiveConfig:
+    """
+    Build a config snapshot.
+
+    Model identifiers are interned since they are used as dict keys
+    throughout each council run.
+    """
+    return _ActiveConfig(
+        council_models=tuple(sys.intern(m) for m in council_models),
+        chairman_model=sys.intern(chairman_model),
+    )
+
+
+# Rebound (never mutated) whenever the config changes
+_active_config = _make_config(DEFAULT_COUNCIL_MODELS, DEFAULT_CHAIRMAN_MODEL)
+
+# mtime (ns) of CONFIG_FILE when it was last parsed or written
+_cached_mtime = None
+
+
+def _config_mtime():
+    """Return CONFIG_FILE's mtime in nanoseconds, or None if it doesn't exist."""
+    try:
+        return os.stat(CONFIG_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
 
 
 def load_config():
-    """Load config from disk, or write defaults if not found."""
-    global _active_config
+    """
+    Load config from disk, or write defaults if not found.
+
+    Skips re-parsing when the file is unchanged since the last load/save.
+    """
+    global _active_config, _cached_mtime
+    mtime = _config_mtime()
+    if mtime is not None and mtime == _cached_mtime:
+        return
     try:
-        with open(CONFIG_FILE, "r") as f:
-            data = json.load(f)
-            _active_config["council_models"] = data.get("council_models", list(DEFAULT_COUNCIL_MODELS))
-            _active_config["chairman_model"] = data.get("chairman_model", DEFAULT_CHAIRMAN_MODEL)
-    except (FileNotFoundError, json.JSONDecodeError):
+        with open(CONFIG_FILE, "rb") as f:
+            data = json_loads(f.read())
+        _active_config = _make_config(
+            data.get("council_models", DEFAULT_COUNCIL_MODELS),
+            data.get("chairman_model", DEFAULT_CHAIRMAN_MODEL),
+        )
+        _cached_mtime = mtime
+    except (OSError, json.JSONDecodeError):
         # Write defaults to disk
         save_config()
 
 
 def save_config():
     """Persist current config to disk."""
+    global _cached_mtime
+    payload = json_dumps({
+        "council_models": list(_active_config.council_models),
+        "chairman_model": _active_config.chairman_model,
+    }, indent=True)
     os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(_active_config, f, indent=2)
+    with open(CONFIG_FILE, "wb") as f:
+        f.write(payload)
+    _cached_mtime = _config_mtime()
 
 
 def get_council_models():
-    """Return the current list of council models."""
-    return list(_active_config["council_models"])
+    """Return the current council models as a shared immutable tuple."""
+    return _active_config.council_models
 
 
 def get_chairman_model():
     """Return the current chairman model."""
-    return _active_config["chairman_model"]
+    return _active_config.chairman_model
 
 
 def update_config(council_models, chairman_model):
     """Update and persist the config."""
-    _active_config["council_models"] = list(council_models)
-    _active_config["chairman_model"] = chairman_model
+    global _active_config
+    _active_config = _make_config(council_models, chairman_model)
     save_config()
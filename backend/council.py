@@ -1,15 +1,100 @@
 """3-stage LLM Council orchestration."""
 
-from typing import List, Dict, Any, Tuple
+import asyncio
+import re
+from typing import List, Dict, Any, Sequence, Tuple
 from .openrouter import query_models_parallel, query_model, query_model_stream, query_models_stream, query_models_stream_per_model
 from .config import get_council_models, get_chairman_model
 from .search import SEARCH_TOOLS, execute_search_tool
 
+# Ranking parsers: numbered entries ("1. Response A") and bare labels
+_NUMBERED_RE = re.compile(r'\d+\.\s*(Response [A-Z])')
+_RESPONSE_RE = re.compile(r'Response [A-Z]')
+
+# Prompt templates; only the per-request fields are interpolated at call time
+_STAGE2_PROMPT_TEMPLATE = """You are evaluating different responses to the following question:
+
+Question: {question}
+
+Here are the responses from different models (anonymized):
+
+{responses}
+
+Your task:
+1. First, evaluate each response individually. For each response, explain what it does well and what it does poorly.
+2. Then, at the very end of your response, provide a final ranking.
+
+IMPORTANT: Your final ranking MUST be formatted EXACTLY as follows:
+- Start with the line "FINAL RANKING:" (all caps, with colon)
+- Then list the responses from best to worst as a numbered list
+- Each line should be: number, period, space, then ONLY the response label (e.g., "1. Response A")
+- Do not add any other text or explanations in the ranking section
+
+Example of the correct format for your ENTIRE response:
+
+Response A provides good detail on X but misses Y...
+Response B is accurate but lacks depth on Z...
+Response C offers the most comprehensive answer...
+
+FINAL RANKING:
+1. Response C
+2. Response A
+3. Response B
+
+Now provide your evaluation and ranking:"""
+
+_STAGE3_PROMPT_TEMPLATE = """You are the Chairman of an LLM Council. Multiple AI models have provided responses to a user's question, and then ranked each other's responses.
+
+Original Question: {question}
+
+STAGE 1 - Individual Responses:
+{stage1_text}
+
+STAGE 2 - Peer Rankings:
+{stage2_text}
+
+Your task as Chairman is to synthesize all of this information into a single, comprehensive, accurate answer to the user's original question. Consider:
+- The individual responses and their insights
+- The peer rankings and what they reveal about response quality
+- Any patterns of agreement or disagreement
+
+Provide a clear, well-reasoned final answer that represents the council's collective wisdom:"""
+
+_TITLE_PROMPT_TEMPLATE = """Generate a very short title (3-5 words maximum) that summarizes the following question.
+The title should be concise and descriptive. Do not use quotes or punctuation in the title.
+
+Question: {question}
+
+Title:"""
+
+
+def _extract_turn_pairs(
+    prior_messages: List[Dict[str, Any]]
+) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Extract (user, assistant) message pairs from conversation history.
+
+    Unpaired messages (e.g. a user turn whose run failed) are skipped and
+    pairing resumes at the next message.
+    """
+    pairs = []
+    it = iter(prior_messages)
+    prev = next(it, None)
+    for msg in it:
+        if prev.get("role") == "user" and msg.get("role") == "assistant":
+            pairs.append((prev, msg))
+            prev = next(it, None)
+            if prev is None:
+                break
+        else:
+            prev = msg
+    return pairs
+
 
 def build_stage1_history(
     prior_messages: List[Dict[str, Any]],
     current_query: str,
-    models: List[str]
+    models: Sequence[str]
 ) -> Dict[str, List[Dict[str, str]]]:
     """
     Build per-model chat histories from conversation history.
@@ -23,15 +108,7 @@ def build_stage1_history(
     """
     model_messages: Dict[str, List[Dict[str, str]]] = {model: [] for model in models}
 
-    # Extract (user, assistant) pairs from prior messages
-    pairs = []
-    i = 0
-    while i < len(prior_messages) - 1:
-        if prior_messages[i].get("role") == "user" and prior_messages[i + 1].get("role") == "assistant":
-            pairs.append((prior_messages[i], prior_messages[i + 1]))
-            i += 2
-        else:
-            i += 1
+    pairs = _extract_turn_pairs(prior_messages)
 
     prev_summary = ""
     for user_msg, assistant_msg in pairs:
@@ -43,12 +120,14 @@ def build_stage1_history(
         # Lookup table: model -> its own stage1 response
         stage1_by_model = {r["model"]: r["response"] for r in stage1_results}
 
+        # Prefix user message with previous turn's chairman summary.
+        # Built once per turn; every model's history shares the same string.
+        if prev_summary:
+            content = f"[Council's synthesized answer]\n{prev_summary}\n\n{user_content}"
+        else:
+            content = user_content
+
         for model in models:
-            # Prefix user message with previous turn's chairman summary
-            if prev_summary:
-                content = f"[Council's synthesized answer]\n{prev_summary}\n\n{user_content}"
-            else:
-                content = user_content
             model_messages[model].append({"role": "user", "content": content})
 
             # Model's own response, or chairman summary as fallback
@@ -58,11 +137,11 @@ def build_stage1_history(
         prev_summary = chairman_summary
 
     # Append the current query as the final user message
+    if prev_summary:
+        content = f"[Council's synthesized answer]\n{prev_summary}\n\n{current_query}"
+    else:
+        content = current_query
     for model in models:
-        if prev_summary:
-            content = f"[Council's synthesized answer]\n{prev_summary}\n\n{current_query}"
-        else:
-            content = current_query
         model_messages[model].append({"role": "user", "content": content})
 
     return model_messages
@@ -79,22 +158,13 @@ def build_stage3_history(
     """
     history: List[Dict[str, str]] = []
 
-    i = 0
-    while i < len(prior_messages) - 1:
-        if prior_messages[i].get("role") == "user" and prior_messages[i + 1].get("role") == "assistant":
-            user_msg = prior_messages[i]
-            assistant_msg = prior_messages[i + 1]
-
-            stage3_result = assistant_msg.get("stage3") or {}
-            chairman_summary = stage3_result.get("response", "")
+    for user_msg, assistant_msg in _extract_turn_pairs(prior_messages):
+        stage3_result = assistant_msg.get("stage3") or {}
+        chairman_summary = stage3_result.get("response", "")
 
-            history.append({"role": "user", "content": user_msg["content"]})
-            if chairman_summary:
-                history.append({"role": "assistant", "content": chairman_summary})
-
-            i += 2
-        else:
-            i += 1
+        history.append({"role": "user", "content": user_msg["content"]})
+        if chairman_summary:
+            history.append({"role": "assistant", "content": chairman_summary})
 
     return history
 
@@ -147,65 +217,77 @@ async def stage1_collect_responses_stream(user_query: str, conversation_history=
             yield model, chunk
 
 
-async def stage2_collect_rankings(
+def _build_stage2_prompt(
     user_query: str,
     stage1_results: List[Dict[str, Any]]
-) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+) -> Tuple[str, Dict[str, str]]:
     """
-    Stage 2: Each model ranks the anonymized responses.
-
-    Args:
-        user_query: The original user query
-        stage1_results: Results from Stage 1
+    Build the anonymized Stage 2 ranking prompt.
 
     Returns:
-        Tuple of (rankings list, label_to_model mapping)
+        Tuple of (ranking prompt, label_to_model mapping)
     """
-    # Create anonymized labels for responses (Response A, Response B, etc.)
-    labels = [chr(65 + i) for i in range(len(stage1_results))]  # A, B, C, ...
-
-    # Create mapping from label to model name
-    label_to_model = {
-        f"Response {label}": result['model']
-        for label, result in zip(labels, stage1_results)
-    }
+    # Anonymize responses (Response A, Response B, etc.), building the
+    # label -> model mapping and the prompt body in a single pass
+    label_to_model = {}
+    parts = []
+    for i, result in enumerate(stage1_results):
+        key = f"Response {chr(65 + i)}"  # A, B, C, ...
+        label_to_model[key] = result['model']
+        parts.append(f"{key}:\n{result['response']}")
+    responses_text = "\n\n".join(parts)
+
+    ranking_prompt = _STAGE2_PROMPT_TEMPLATE.format(
+        question=user_query,
+        responses=responses_text,
+    )
 
-    # Build the ranking prompt
-    responses_text = "\n\n".join([
-        f"Response {label}:\n{result['response']}"
-        for label, result in zip(labels, stage1_results)
-    ])
+    return ranking_prompt, label_to_model
 
-    ranking_prompt = f"""You are evaluating different responses to the following question:
 
-Question: {user_query}
+def _format_stage_block(results: List[Dict[str, Any]], field: str) -> str:
+    """Format stage results as "Model: ...\n<Field>: ..." entries for the chairman."""
+    heading = field.capitalize()
+    return "\n\n".join([
+        f"Model: {result['model']}\n{heading}: {result[field]}"
+        for result in results
+    ])
 
-Here are the responses from different models (anonymized):
 
-{responses_text}
+def _build_stage3_prompt(
+    user_query: str,
+    stage1_results: List[Dict[str, Any]],
+    stage2_results: List[Dict[str, Any]]
+) -> str:
+    """Build the Stage 3 chairman prompt from all responses and rankings."""
+    # Build comprehensive context for chairman
+    stage1_text = _format_stage_block(stage1_results, 'response')
+    stage2_text = _format_stage_block(stage2_results, 'ranking')
 
-Your task:
-1. First, evaluate each response individually. For each response, explain what it does well and what it does poorly.
-2. Then, at the very end of your response, provide a final ranking.
+    chairman_prompt = _STAGE3_PROMPT_TEMPLATE.format(
+        question=user_query,
+        stage1_text=stage1_text,
+        stage2_text=stage2_text,
+    )
 
-IMPORTANT: Your final ranking MUST be formatted EXACTLY as follows:
-- Start with the line "FINAL RANKING:" (all caps, with colon)
-- Then list the responses from best to worst as a numbered list
-- Each line should be: number, period, space, then ONLY the response label (e.g., "1. Response A")
-- Do not add any other text or explanations in the ranking section
+    return chairman_prompt
 
-Example of the correct format for your ENTIRE response:
 
-Response A provides good detail on X but misses Y...
-Response B is accurate but lacks depth on Z...
-Response C offers the most comprehensive answer...
+async def stage2_collect_rankings(
+    user_query: str,
+    stage1_results: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """
+    Stage 2: Each model ranks the anonymized responses.
 
-FINAL RANKING:
-1. Response C
-2. Response A
-3. Response B
+    Args:
+        user_query: The original user query
+        stage1_results: Results from Stage 1
 
-Now provide your evaluation and ranking:"""
+    Returns:
+        Tuple of (rankings list, label_to_model mapping)
+    """
+    ranking_prompt, label_to_model = _build_stage2_prompt(user_query, stage1_results)
 
     messages = [{"role": "user", "content": ranking_prompt}]
 
@@ -236,51 +318,7 @@ async def stage2_collect_rankings_stream(
     Stage 2: Each model ranks the anonymized responses (Streaming).
     Yields (model, chunk, label_to_model) tuples.
     """
-    # Create anonymized labels for responses (Response A, Response B, etc.)
-    labels = [chr(65 + i) for i in range(len(stage1_results))]  # A, B, C, ...
-
-    # Create mapping from label to model name
-    label_to_model = {
-        f"Response {label}": result['model']
-        for label, result in zip(labels, stage1_results)
-    }
-
-    # Build the ranking prompt
-    responses_text = "\n\n".join([
-        f"Response {label}:\n{result['response']}"
-        for label, result in zip(labels, stage1_results)
-    ])
-
-    ranking_prompt = f"""You are evaluating different responses to the following question:
-
-Question: {user_query}
-
-Here are the responses from different models (anonymized):
-
-{responses_text}
-
-Your task:
-1. First, evaluate each response individually. For each response, explain what it does well and what it does poorly.
-2. Then, at the very end of your response, provide a final ranking.
-
-IMPORTANT: Your final ranking MUST be formatted EXACTLY as follows:
-- Start with the line "FINAL RANKING:" (all caps, with colon)
-- Then list the responses from best to worst as a numbered list
-- Each line should be: number, period, space, then ONLY the response label (e.g., "1. Response A")
-- Do not add any other text or explanations in the ranking section
-
-Example of the correct format for your ENTIRE response:
-
-Response A provides good detail on X but misses Y...
-Response B is accurate but lacks depth on Z...
-Response C offers the most comprehensive answer...
-
-FINAL RANKING:
-1. Response C
-2. Response A
-3. Response B
-
-Now provide your evaluation and ranking:"""
+    ranking_prompt, label_to_model = _build_stage2_prompt(user_query, stage1_results)
 
     messages = [{"role": "user", "content": ranking_prompt}]
 
@@ -309,33 +347,7 @@ async def stage3_synthesize_final(
     Returns:
         Dict with 'model' and 'response' keys
     """
-    # Build comprehensive context for chairman
-    stage1_text = "\n\n".join([
-        f"Model: {result['model']}\nResponse: {result['response']}"
-        for result in stage1_results
-    ])
-
-    stage2_text = "\n\n".join([
-        f"Model: {result['model']}\nRanking: {result['ranking']}"
-        for result in stage2_results
-    ])
-
-    chairman_prompt = f"""You are the Chairman of an LLM Council. Multiple AI models have provided responses to a user's question, and then ranked each other's responses.
-
-Original Question: {user_query}
-
-STAGE 1 - Individual Responses:
-{stage1_text}
-
-STAGE 2 - Peer Rankings:
-{stage2_text}
-
-Your task as Chairman is to synthesize all of this information into a single, comprehensive, accurate answer to the user's original question. Consider:
-- The individual responses and their insights
-- The peer rankings and what they reveal about response quality
-- Any patterns of agreement or disagreement
-
-Provide a clear, well-reasoned final answer that represents the council's collective wisdom:"""
+    chairman_prompt = _build_stage3_prompt(user_query, stage1_results, stage2_results)
 
     chairman_model = get_chairman_model()
     messages = [{"role": "user", "content": chairman_prompt}]
@@ -372,33 +384,7 @@ async def stage3_synthesize_final_stream(
         stage2_results: Rankings from Stage 2
         conversation_history: Optional list of prior messages for multi-turn context
     """
-    # Build comprehensive context for chairman
-    stage1_text = "\n\n".join([
-        f"Model: {result['model']}\nResponse: {result['response']}"
-        for result in stage1_results
-    ])
-
-    stage2_text = "\n\n".join([
-        f"Model: {result['model']}\nRanking: {result['ranking']}"
-        for result in stage2_results
-    ])
-
-    chairman_prompt = f"""You are the Chairman of an LLM Council. Multiple AI models have provided responses to a user's question, and then ranked each other's responses.
-
-Original Question: {user_query}
-
-STAGE 1 - Individual Responses:
-{stage1_text}
-
-STAGE 2 - Peer Rankings:
-{stage2_text}
-
-Your task as Chairman is to synthesize all of this information into a single, comprehensive, accurate answer to the user's original question. Consider:
-- The individual responses and their insights
-- The peer rankings and what they reveal about response quality
-- Any patterns of agreement or disagreement
-
-Provide a clear, well-reasoned final answer that represents the council's collective wisdom:"""
+    chairman_prompt = _build_stage3_prompt(user_query, stage1_results, stage2_results)
 
     chairman_model = get_chairman_model()
 
@@ -414,11 +400,11 @@ Provide a clear, well-reasoned final answer that represents the council's collec
         "model": chairman_model
     }
 
-    # Stream the response
-    full_response = ""
+    # Stream the response, buffering chunks and joining once at the end
+    chunks: List[str] = []
     async for chunk in query_model_stream(chairman_model, messages, tools=SEARCH_TOOLS, tool_executor=execute_search_tool):
         if chunk:
-            full_response += chunk
+            chunks.append(chunk)
             yield {
                 "type": "content_chunk",
                 "chunk": chunk
@@ -429,7 +415,7 @@ Provide a clear, well-reasoned final answer that represents the council's collec
         "type": "complete",
         "data": {
             "model": chairman_model,
-            "response": full_response
+            "response": "".join(chunks)
         }
     }
 
@@ -444,27 +430,24 @@ def parse_ranking_from_text(ranking_text: str) -> List[str]:
     Returns:
         List of response labels in ranked order
     """
-    import re
-
     # Look for "FINAL RANKING:" section
-    if "FINAL RANKING:" in ranking_text:
-        # Extract everything after "FINAL RANKING:"
-        parts = ranking_text.split("FINAL RANKING:")
-        if len(parts) >= 2:
-            ranking_section = parts[1]
-            # Try to extract numbered list format (e.g., "1. Response A")
-            # This pattern looks for: number, period, optional space, "Response X"
-            numbered_matches = re.findall(r'\d+\.\s*Response [A-Z]', ranking_section)
-            if numbered_matches:
-                # Extract just the "Response X" part
-                return [re.search(r'Response [A-Z]', m).group() for m in numbered_matches]
-
-            # Fallback: Extract all "Response X" patterns in order
-            matches = re.findall(r'Response [A-Z]', ranking_section)
-            return matches
+    _, marker, tail = ranking_text.partition("FINAL RANKING:")
+    if marker:
+        # Extract everything after "FINAL RANKING:" (up to any repeated header)
+        ranking_section = tail.partition("FINAL RANKING:")[0]
+        # Try to extract numbered list format (e.g., "1. Response A")
+        # This pattern looks for: number, period, optional space, "Response X"
+        # The capture group yields just the "Response X" part
+        numbered_matches = _NUMBERED_RE.findall(ranking_section)
+        if numbered_matches:
+            return numbered_matches
+
+        # Fallback: Extract all "Response X" patterns in order
+        matches = _RESPONSE_RE.findall(ranking_section)
+        return matches
 
     # Fallback: try to find any "Response X" patterns in order
-    matches = re.findall(r'Response [A-Z]', ranking_text)
+    matches = _RESPONSE_RE.findall(ranking_text)
     return matches
 
 
@@ -484,30 +467,30 @@ def calculate_aggregate_rankings(
     """
     from collections import defaultdict
 
-    # Track positions for each model
-    model_positions = defaultdict(list)
+    # Track [sum of positions, count] for each model
+    model_positions = defaultdict(lambda: [0, 0])
 
     for ranking in stage2_results:
-        ranking_text = ranking['ranking']
-
-        # Parse the ranking from the structured format
-        parsed_ranking = parse_ranking_from_text(ranking_text)
+        # Reuse the ranking parsed when the stage 2 result was built
+        parsed_ranking = ranking.get('parsed_ranking')
+        if parsed_ranking is None:
+            parsed_ranking = parse_ranking_from_text(ranking['ranking'])
 
         for position, label in enumerate(parsed_ranking, start=1):
-            if label in label_to_model:
-                model_name = label_to_model[label]
-                model_positions[model_name].append(position)
+            model_name = label_to_model.get(label)
+            if model_name is not None:
+                entry = model_positions[model_name]
+                entry[0] += position
+                entry[1] += 1
 
     # Calculate average position for each model
     aggregate = []
-    for model, positions in model_positions.items():
-        if positions:
-            avg_rank = sum(positions) / len(positions)
-            aggregate.append({
-                "model": model,
-                "average_rank": round(avg_rank, 2),
-                "rankings_count": len(positions)
-            })
+    for model, (total, count) in model_positions.items():
+        aggregate.append({
+            "model": model,
+            "average_rank": round(total / count, 2),
+            "rankings_count": count
+        })
 
     # Sort by average rank (lower is better)
     aggregate.sort(key=lambda x: x['average_rank'])
@@ -525,12 +508,7 @@ async def generate_conversation_title(user_query: str) -> str:
     Returns:
         A short title (3-5 words)
     """
-    title_prompt = f"""Generate a very short title (3-5 words maximum) that summarizes the following question.
-The title should be concise and descriptive. Do not use quotes or punctuation in the title.
-
-Question: {user_query}
-
-Title:"""
+    title_prompt = _TITLE_PROMPT_TEMPLATE.format(question=user_query)
 
     messages = [{"role": "user", "content": title_prompt}]
 
@@ -573,18 +551,26 @@ async def run_full_council(user_query: str) -> Tuple[List, List, Dict, Dict]:
             "response": "All models failed to respond. Please try again."
         }, {}
 
-    # Stage 2: Collect rankings
-    stage2_results, label_to_model = await stage2_collect_rankings(user_query, stage1_results)
-
-    # Calculate aggregate rankings
-    aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
+    if len(stage1_results) == 1:
+        # Nothing to rank with a single response; go straight to the chairman
+        stage2_results = []
+        label_to_model = {"Response A": stage1_results[0]['model']}
+    else:
+        # Stage 2: Collect rankings
+        stage2_results, label_to_model = await stage2_collect_rankings(user_query, stage1_results)
 
-    # Stage 3: Synthesize final answer
-    stage3_result = await stage3_synthesize_final(
+    # Stage 3: Synthesize final answer. Aggregation is synchronous, so the
+    # chairman task only starts running at the await below.
+    stage3_task = asyncio.create_task(stage3_synthesize_final(
         user_query,
         stage1_results,
         stage2_results
-    )
+    ))
+
+    # Calculate aggregate rankings
+    aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
+
+    stage3_result = await stage3_task
 
     # Prepare metadata
     metadata = {
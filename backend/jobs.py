@@ -1,14 +1,20 @@
 """Job management for durable streaming responses."""
 
 import asyncio
-import json
+import heapq
+import os
+import shutil
 import uuid
 import time
 import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, BinaryIO, Deque, Dict, List, Optional, Tuple
 
 from . import storage
+from .config import JOBS_DIR, PENDING_JOBS_LOG
+from .json_codec import json_dumps
 from .council import (
     stage1_collect_responses_stream,
     stage2_collect_rankings_stream,
@@ -19,15 +25,53 @@ from .council import (
 )
 
 
-@dataclass
+# Consecutive chunk events for the same stage/model are coalesced into one
+# event, flushed after this many seconds or this many chunks.
+CHUNK_FLUSH_INTERVAL = 0.02
+CHUNK_FLUSH_MAX_CHUNKS = 64
+
+# Most recent SSE frames kept in memory per job; older frames are replayed
+# from the job's on-disk event log.
+JOB_EVENTS_WINDOW = 1024
+
+# Frames a live reader may have queued before it is detached and left to
+# catch up from the in-memory window / event log instead.
+READER_QUEUE_MAX = 1024
+
+# Payload bytes read from a job's event log per replay batch, so a reader far
+# behind doesn't load the rest of a long job into one write.
+LOG_REPLAY_BATCH_BYTES = 256 * 1024
+
+# Each log record is a 4-byte big-endian length followed by the event's JSON;
+# the SSE framing is stripped on write and re-added on replay
+_LOG_LENGTH_BYTES = 4
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+
+_CHUNK_EVENT_TYPES = frozenset({"stage1_chunk", "stage2_chunk", "stage3_chunk"})
+_TERMINAL_EVENT_TYPES = frozenset({"complete", "error"})
+
+
+def _encode_event(event: dict) -> bytes:
+    """Serialize an event as a ready-to-send SSE data frame."""
+    return _SSE_PREFIX + json_dumps(event, compact=True) + _SSE_SUFFIX
+
+
+@dataclass(slots=True)
 class Job:
     """Represents an in-flight council pipeline job."""
     job_id: str
     conversation_id: str
     query: str
+    prior_messages: List[Dict[str, Any]] = field(default_factory=list)  # history before query
     status: str = "pending"  # pending -> stage1 -> stage2 -> stage3 -> complete | error
-    events: list = field(default_factory=list)
-    new_event: asyncio.Event = field(default_factory=asyncio.Event)
+    # Tail of the pre-serialized SSE frames; events[0] is event number events_head
+    events: Deque[bytes] = field(default_factory=lambda: deque(maxlen=JOB_EVENTS_WINDOW))
+    events_head: int = 0
+    log_file: Optional[BinaryIO] = None  # append-only log of every frame; writer thread only
+    terminal: bool = False  # set once the complete/error event is appended
+    # Per-reader queues that new frames are pushed to; None detaches a reader
+    live_queues: List["asyncio.Queue[Optional[bytes]]"] = field(default_factory=list)
     stage1_results: Optional[List[Dict[str, Any]]] = None
     stage2_results: Optional[List[Dict[str, Any]]] = None
     stage3_result: Optional[Dict[str, Any]] = None
@@ -35,19 +79,50 @@ class Job:
     created_at: float = field(default_factory=time.time)
     task: Optional[asyncio.Task] = None
 
+    @property
+    def event_count(self) -> int:
+        """Total number of events emitted, including ones evicted from memory."""
+        return self.events_head + len(self.events)
+
+
+def _job_log_path(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, f"{job_id}.log")
+
 
 class JobManager:
-    """In-memory registry of active jobs, keyed by conversation_id."""
+    """
+    In-memory registry of active jobs, keyed by conversation_id.
+
+    Job logs and the pending-jobs log are written by a single writer thread,
+    so file I/O stays off the event loop while writes keep their order.
+    """
 
     def __init__(self):
         self._jobs: Dict[str, Job] = {}  # job_id -> Job
         self._by_conversation: Dict[str, str] = {}  # conversation_id -> job_id
-
-    def create_job(self, conversation_id: str, query: str) -> Job:
+        # (created_at, job_id) for finished jobs, oldest first
+        self._expiry_heap: List[Tuple[float, str]] = []
+        # job_id -> {(event type, model): [first event, chunks]}
+        self._pending_chunks: Dict[str, Dict[tuple, list]] = {}
+        self._flush_handles: Dict[str, asyncio.TimerHandle] = {}
+        self._log_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-log")
+
+    def create_job(
+        self,
+        conversation_id: str,
+        query: str,
+        prior_messages: Optional[List[Dict[str, Any]]] = None,
+    ) -> Job:
         job_id = str(uuid.uuid4())
-        job = Job(job_id=job_id, conversation_id=conversation_id, query=query)
+        job = Job(
+            job_id=job_id,
+            conversation_id=conversation_id,
+            query=query,
+            prior_messages=prior_messages or [],
+        )
         self._jobs[job_id] = job
         self._by_conversation[conversation_id] = job_id
+        self._log_writer.submit(self._write_pending, "a", [f"{job_id},{conversation_id}\n"])
         return job
 
     def get_job(self, job_id: str) -> Optional[Job]:
@@ -72,33 +147,246 @@ class JobManager:
         return self._jobs.get(job_id)
 
     def append_event(self, job: Job, event: dict):
-        job.events.append(event)
-        # Wake all listeners, then replace with a fresh Event
-        job.new_event.set()
-        job.new_event = asyncio.Event()
+        """
+        Record an event and push it to live readers.
+
+        Events are serialized once here, so every reader replays the same
+        bytes. Chunk events are buffered and coalesced; any other event
+        first flushes pending chunks so ordering across stages is preserved.
+        """
+        event_type = event.get("type")
+        if event_type in _CHUNK_EVENT_TYPES:
+            self._buffer_chunk(job, event)
+            return
+        self.flush_chunks(job)
+        self._record(job, _encode_event(event))
+        if event_type in _TERMINAL_EVENT_TYPES:
+            job.terminal = True
+            self._log_writer.submit(self._close_log, job)
+            heapq.heappush(self._expiry_heap, (job.created_at, job.job_id))
+
+    def _record(self, job: Job, frame: bytes):
+        """Append a frame to the job's log and its in-memory window."""
+        self._log_writer.submit(self._write_frame, job, frame)
+        if len(job.events) == job.events.maxlen:
+            job.events_head += 1
+        job.events.append(frame)
+        if job.live_queues:
+            self._publish(job, frame)
+
+    def _publish(self, job: Job, frame: bytes):
+        lagging = None
+        for queue in job.live_queues:
+            if queue.qsize() < READER_QUEUE_MAX:
+                queue.put_nowait(frame)
+            else:
+                queue.put_nowait(None)
+                lagging = lagging or []
+                lagging.append(queue)
+        if lagging:
+            job.live_queues = [q for q in job.live_queues if q not in lagging]
+
+    def subscribe(self, job: Job) -> "asyncio.Queue[Optional[bytes]]":
+        """
+        Register a live reader; every frame recorded from now on is queued.
+
+        The reader must already have consumed all events up to event_count.
+        A None in the queue means the reader fell more than READER_QUEUE_MAX
+        frames behind and was detached; it should catch up via the
+        window/log and subscribe again.
+        """
+        queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue()
+        job.live_queues.append(queue)
+        return queue
+
+    def unsubscribe(self, job: Job, queue: "asyncio.Queue[Optional[bytes]]"):
+        try:
+            job.live_queues.remove(queue)
+        except ValueError:
+            pass  # Already detached
+
+    def _write_frame(self, job: Job, frame: bytes):
+        """Append a frame to the job's log file (writer thread)."""
+        try:
+            if job.log_file is None:
+                os.makedirs(JOBS_DIR, exist_ok=True)
+                job.log_file = open(_job_log_path(job.job_id), "ab")
+            payload = memoryview(frame)[len(_SSE_PREFIX):-len(_SSE_SUFFIX)]
+            job.log_file.write(len(payload).to_bytes(_LOG_LENGTH_BYTES, "big"))
+            job.log_file.write(payload)
+        except OSError:
+            traceback.print_exc()
+
+    def _close_log(self, job: Job):
+        if job.log_file is not None:
+            job.log_file.close()
+            job.log_file = None
+
+    def _flush_log_file(self, job: Job):
+        if job.log_file is not None:
+            job.log_file.flush()
+
+    async def flush_log(self, job: Job):
+        """Wait until all recorded frames are visible to read_logged_events()."""
+        await asyncio.wrap_future(self._log_writer.submit(self._flush_log_file, job))
+
+    def read_logged_events(
+        self,
+        job: Job,
+        start_index: int,
+        position: Tuple[int, int] = (0, 0),
+    ) -> Tuple[List[bytes], Tuple[int, int]]:
+        """
+        Read a batch of frames from the job's log, starting at event start_index.
+
+        Blocking; call via asyncio.to_thread() after awaiting flush_log().
+        Stops after about LOG_REPLAY_BATCH_BYTES of payload. A trailing
+        partially-written record is ignored.
+
+        Args:
+            job: Job whose log to read
+            start_index: Number of the first event to return
+            position: (event number, byte offset) of a record at or before
+                start_index, as returned by a previous call, to skip there
+                directly instead of scanning from the start of the log
+
+        Returns:
+            The frames read, and the position just after the last of them
+        """
+        frames: List[bytes] = []
+        index, offset = position if position[0] <= start_index else (0, 0)
+        try:
+            f = open(_job_log_path(job.job_id), "rb")
+        except FileNotFoundError:
+            return frames, (index, offset)
+        with f:
+            f.seek(offset)
+            batch_bytes = 0
+            while batch_bytes < LOG_REPLAY_BATCH_BYTES:
+                header = f.read(_LOG_LENGTH_BYTES)
+                if len(header) < _LOG_LENGTH_BYTES:
+                    break
+                length = int.from_bytes(header, "big")
+                if index < start_index:
+                    f.seek(length, os.SEEK_CUR)
+                else:
+                    payload = f.read(length)
+                    if len(payload) < length:
+                        break
+                    frames.append(_SSE_PREFIX + payload + _SSE_SUFFIX)
+                    batch_bytes += length
+                index += 1
+                offset += _LOG_LENGTH_BYTES + length
+        return frames, (index, offset)
+
+    def remove_stale_logs(self):
+        """Delete event logs left behind by a previous process."""
+        shutil.rmtree(JOBS_DIR, ignore_errors=True)
+
+    def _buffer_chunk(self, job: Job, event: dict):
+        pending = self._pending_chunks.setdefault(job.job_id, {})
+        key = (event["type"], event.get("model"))
+        entry = pending.get(key)
+        if entry is None:
+            entry = pending[key] = [event, []]
+        entry[1].append(event["chunk"])
+
+        if len(entry[1]) >= CHUNK_FLUSH_MAX_CHUNKS:
+            self.flush_chunks(job)
+        elif job.job_id not in self._flush_handles:
+            loop = asyncio.get_running_loop()
+            self._flush_handles[job.job_id] = loop.call_later(
+                CHUNK_FLUSH_INTERVAL, self.flush_chunks, job
+            )
+
+    def flush_chunks(self, job: Job):
+        """Emit buffered chunks for a job as one event per stage/model."""
+        handle = self._flush_handles.pop(job.job_id, None)
+        if handle is not None:
+            handle.cancel()
+        pending = self._pending_chunks.pop(job.job_id, None)
+        if not pending:
+            return
+        for first_event, chunks in pending.values():
+            self._record(job, _encode_event({**first_event, "chunk": "".join(chunks)}))
 
     def cleanup_old_jobs(self, max_age_seconds: int = 3600):
-        now = time.time()
-        to_delete = [
-            jid for jid, job in self._jobs.items()
-            if job.status in ("complete", "error") and (now - job.created_at) > max_age_seconds
-        ]
-        for jid in to_delete:
+        """Drop finished jobs older than max_age_seconds (O(expired jobs))."""
+        cutoff = time.time() - max_age_seconds
+        heap = self._expiry_heap
+        while heap and heap[0][0] < cutoff:
+            _, jid = heapq.heappop(heap)
             job = self._jobs.pop(jid, None)
             if job:
-                self._by_conversation.pop(job.conversation_id, None)
+                # A newer job may already own this conversation's slot
+                if self._by_conversation.get(job.conversation_id) == jid:
+                    del self._by_conversation[job.conversation_id]
+                self._remove_log(job)
+
+    def read_pending_conversations(self) -> Optional[List[str]]:
+        """
+        Read the pending-jobs log left by a previous process.
+
+        Returns:
+            Ids of conversations that had jobs started since the log was last
+            reset, or None if there is no log (recovery must scan everything)
+        """
+        try:
+            with open(PENDING_JOBS_LOG, "r") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None
+        return list({line.partition(",")[2] for line in lines if "," in line})
+
+    async def write_pending_log(self):
+        """Rewrite the pending-jobs log with only the jobs still running."""
+        lines = [
+            f"{job.job_id},{job.conversation_id}\n"
+            for job in self._jobs.values()
+            if not job.terminal
+        ]
+        await asyncio.wrap_future(self._log_writer.submit(self._write_pending, "w", lines))
+
+    @staticmethod
+    def _write_pending(mode: str, lines: List[str]):
+        """Write lines to the pending-jobs log (writer thread)."""
+        try:
+            os.makedirs(os.path.dirname(PENDING_JOBS_LOG), exist_ok=True)
+            with open(PENDING_JOBS_LOG, mode) as f:
+                f.writelines(lines)
+        except OSError:
+            traceback.print_exc()
+
+    def _remove_log(self, job: Job):
+        self._log_writer.submit(self._delete_log, job)
+
+    def _delete_log(self, job: Job):
+        self._close_log(job)
+        try:
+            os.remove(_job_log_path(job.job_id))
+        except FileNotFoundError:
+            pass
 
 
 # Singleton
 job_manager = JobManager()
 
 
-def _save_partial_assistant(conversation_id: str, job: Job):
-    """Progressively save assistant message to storage."""
-    storage.upsert_assistant_message(
+async def _save_partial_assistant(conversation_id: str, job: Job, status: Optional[str] = None):
+    """
+    Progressively save assistant message to storage (off the event loop).
+
+    Args:
+        conversation_id: Conversation the message belongs to
+        job: Job whose results are saved
+        status: Status to store instead of job.status (used for the final save,
+            which happens before the job is marked terminal)
+    """
+    await asyncio.to_thread(
+        storage.upsert_assistant_message,
         conversation_id,
         job_id=job.job_id,
-        status=job.status,
+        status=status or job.status,
         stage1=job.stage1_results,
         stage2=job.stage2_results,
         stage3=job.stage3_result,
@@ -112,26 +400,26 @@ async def run_council_pipeline(job: Job):
     query = job.query
 
     try:
-        # Load conversation history for multi-turn context
-        conversation = storage.get_conversation(conversation_id)
-        prior_messages = conversation["messages"][:-1] if conversation and len(conversation["messages"]) > 1 else []
-        conversation_history = prior_messages if prior_messages else None
+        # Conversation history for multi-turn context, loaded by the caller
+        conversation_history = job.prior_messages or None
+        is_first_turn = not job.prior_messages
 
         # --- Stage 1 ---
         job.status = "stage1"
         job_manager.append_event(job, {"type": "stage1_start"})
 
-        stage1_results_map: Dict[str, str] = {}
+        # model -> list of chunks, joined once the stage finishes
+        stage1_results_map: Dict[str, List[str]] = {}
 
         async for model, chunk in stage1_collect_responses_stream(query, conversation_history):
             if model not in stage1_results_map:
-                stage1_results_map[model] = ""
+                stage1_results_map[model] = []
                 job_manager.append_event(job, {
                     "type": "stage1_init",
                     "data": {"model": model, "response": ""},
                 })
 
-            stage1_results_map[model] += chunk
+            stage1_results_map[model].append(chunk)
             job_manager.append_event(job, {
                 "type": "stage1_chunk",
                 "model": model,
@@ -139,24 +427,22 @@ async def run_council_pipeline(job: Job):
             })
 
         stage1_results = [
-            {"model": model, "response": response}
-            for model, response in stage1_results_map.items()
+            {"model": model, "response": "".join(parts)}
+            for model, parts in stage1_results_map.items()
         ]
         job.stage1_results = stage1_results
 
-        job_manager.append_event(job, {
-            "type": "stage1_complete",
-            "data": stage1_results,
-        })
+        # Clients already hold every chunk, so only mark the stage as done
+        job_manager.append_event(job, {"type": "stage1_complete"})
 
         # Save after stage 1
-        _save_partial_assistant(conversation_id, job)
+        await _save_partial_assistant(conversation_id, job)
 
         # --- Stage 2 ---
         job.status = "stage2"
         job_manager.append_event(job, {"type": "stage2_start"})
 
-        stage2_results_map: Dict[str, str] = {}
+        stage2_results_map: Dict[str, List[str]] = {}
         label_to_model = {}
 
         async for model, chunk, ltm in stage2_collect_rankings_stream(query, stage1_results):
@@ -169,13 +455,13 @@ async def run_council_pipeline(job: Job):
                 continue
 
             if model not in stage2_results_map:
-                stage2_results_map[model] = ""
+                stage2_results_map[model] = []
                 job_manager.append_event(job, {
                     "type": "stage2_init",
                     "data": {"model": model, "ranking": ""},
                 })
 
-            stage2_results_map[model] += chunk
+            stage2_results_map[model].append(chunk)
             job_manager.append_event(job, {
                 "type": "stage2_chunk",
                 "model": model,
@@ -183,7 +469,8 @@ async def run_council_pipeline(job: Job):
             })
 
         stage2_results = []
-        for model, ranking_text in stage2_results_map.items():
+        for model, parts in stage2_results_map.items():
+            ranking_text = "".join(parts)
             parsed = parse_ranking_from_text(ranking_text)
             stage2_results.append({
                 "model": model,
@@ -198,21 +485,21 @@ async def run_council_pipeline(job: Job):
             "aggregate_rankings": aggregate_rankings,
         }
 
+        # Rankings were streamed as chunks and label_to_model went out with
+        # stage2_map, so only the aggregate rankings are new here
         job_manager.append_event(job, {
             "type": "stage2_complete",
-            "data": stage2_results,
-            "metadata": job.metadata,
+            "metadata": {"aggregate_rankings": aggregate_rankings},
         })
 
         # Save after stage 2
-        _save_partial_assistant(conversation_id, job)
+        await _save_partial_assistant(conversation_id, job)
 
         # --- Stage 3 ---
         job.status = "stage3"
         job_manager.append_event(job, {"type": "stage3_start"})
 
         stage3_model = ""
-        stage3_full_response = ""
 
         async for event in stage3_synthesize_final_stream(query, stage1_results, stage2_results, conversation_history):
             if event["type"] == "model_info":
@@ -222,11 +509,9 @@ async def run_council_pipeline(job: Job):
                     "data": {"model": stage3_model, "response": ""},
                 })
             elif event["type"] == "content_chunk":
-                chunk = event["chunk"]
-                stage3_full_response += chunk
                 job_manager.append_event(job, {
                     "type": "stage3_chunk",
-                    "chunk": chunk,
+                    "chunk": event["chunk"],
                 })
             elif event["type"] == "complete":
                 job.stage3_result = event["data"]
@@ -237,12 +522,10 @@ async def run_council_pipeline(job: Job):
         })
 
         # --- Title generation (if first message) ---
-        conversation = storage.get_conversation(conversation_id)
-        if conversation and len(conversation["messages"]) <= 2:
-            # First user + first assistant = 2 messages
+        if is_first_turn:
             try:
                 title = await generate_conversation_title(query)
-                storage.update_conversation_title(conversation_id, title)
+                await asyncio.to_thread(storage.update_conversation_title, conversation_id, title)
                 job_manager.append_event(job, {
                     "type": "title_complete",
                     "data": {"title": title},
@@ -251,15 +534,25 @@ async def run_council_pipeline(job: Job):
                 pass  # Title generation is best-effort
 
         # --- Complete ---
+        # The status only turns terminal together with the terminal event, so
+        # a reader reconnecting during the save still waits for that event
+        await _save_partial_assistant(conversation_id, job, status="complete")
         job.status = "complete"
-        _save_partial_assistant(conversation_id, job)
         job_manager.append_event(job, {"type": "complete"})
 
     except Exception as e:
         traceback.print_exc()
+        try:
+            await _save_partial_assistant(conversation_id, job, status="error")
+        except Exception:
+            traceback.print_exc()
         job.status = "error"
-        _save_partial_assistant(conversation_id, job)
         job_manager.append_event(job, {
             "type": "error",
             "message": str(e),
         })
+
+
+def start_council_pipeline(job: Job) -> asyncio.Task:
+    """Start the pipeline for a job as a named background task."""
+    return asyncio.create_task(run_council_pipeline(job), name=f"council-pipeline-{job.job_id}")
@@ -0,0 +1,40 @@
+"""JSON encoding and decoding that uses orjson when it is installed."""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional speedup; fall back to stdlib json
+    orjson = None
+
+
+def json_loads(raw):
+    """
+    Parse JSON from str or bytes.
+
+    orjson's errors subclass json.JSONDecodeError, so callers catch that
+    either way.
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def json_dumps(data, indent: bool = False, compact: bool = False) -> bytes:
+    """
+    Serialize data to UTF-8 JSON bytes.
+
+    Args:
+        data: JSON-serializable value
+        indent: Indent nested values by 2 spaces
+        compact: Omit whitespace after separators and keep non-ASCII text
+            unescaped in the stdlib fallback, as orjson always does
+
+    Returns:
+        Encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else None)
+    if compact:
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return json.dumps(data, indent=2 if indent else None).encode("utf-8")
@@ -0,0 +1,72 @@
+"""In-memory exact-match cache for LLM responses."""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Most responses kept, and how long (seconds) a cached response stays valid
+LLM_CACHE_MAX_ENTRIES = 512
+LLM_CACHE_TTL = 3600.0
+
+
+class LLMCache:
+    """LRU cache of LLM responses keyed by a hash of the request, with a TTL."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float = LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (expires_at, response), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> str:
+        """
+        Build a cache key for a request.
+
+        Args:
+            model: OpenRouter model identifier
+            messages: Messages sent to the model
+            tools: Tool definitions offered to the model, if any
+
+        Returns:
+            Hex SHA-256 digest of the canonical JSON request
+        """
+        canonical = json.dumps(
+            {"model": model, "messages": messages, "tools": tools},
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached response, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return dict(response)
+
+    def set(self, key: str, response: Dict[str, Any]):
+        """Store a response, evicting the least recently used entry if full."""
+        self._entries[key] = (time.monotonic() + self.ttl, dict(response))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Singleton
+llm_cache = LLMCache()
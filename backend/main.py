@@ -3,20 +3,22 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import uuid
-import json
 import asyncio
 import time
+from itertools import islice
 
 import httpx
 
-from . import storage
+from . import openrouter, search, storage
 from .config import load_config, get_council_models, get_chairman_model, update_config, OPENROUTER_API_KEY
 from .council import run_full_council, generate_conversation_title
-from .jobs import job_manager, run_council_pipeline
+from .jobs import job_manager, start_council_pipeline
+from .json_codec import json_dumps
+from .search_cache import search_cache
 
 
 # --- Lifecycle ---
@@ -28,21 +30,54 @@ async def _periodic_cleanup():
         job_manager.cleanup_old_jobs()
 
 
+async def _warm_up():
+    """
+    Load tokenizer and search-cache embedding models in worker threads.
+
+    Both may need downloading, so this runs in the background: neither
+    startup nor the first request waits on it, and the first web search
+    doesn't pay for the model load inside its tool round.
+    """
+    await asyncio.gather(
+        asyncio.to_thread(
+            openrouter.load_token_encoders, [*get_council_models(), get_chairman_model()]
+        ),
+        asyncio.to_thread(search_cache.load_model),
+    )
+
+
+def _fix_orphaned_messages(conversation_id: str):
+    """Mark in-progress assistant messages in one conversation as 'error'."""
+    conv = storage.get_conversation(conversation_id)
+    if conv is None:
+        return
+    changed = False
+    for msg in conv["messages"]:
+        if msg.get("role") == "assistant" and msg.get("status") not in (None, "complete", "error"):
+            msg["status"] = "error"
+            changed = True
+    if changed:
+        storage.save_conversation(conv)
+
+
 async def _mark_orphaned_messages():
-    """On startup, mark any in-progress assistant messages as 'error'."""
+    """
+    On startup, mark any in-progress assistant messages as 'error'.
+
+    Only conversations listed in the pending-jobs log can hold such messages;
+    without a log (first run), every conversation is scanned.
+    """
     try:
-        conversations = storage.list_conversations()
-        for conv_meta in conversations:
-            conv = storage.get_conversation(conv_meta["id"])
-            if conv is None:
-                continue
-            changed = False
-            for msg in conv["messages"]:
-                if msg.get("role") == "assistant" and msg.get("status") not in (None, "complete", "error"):
-                    msg["status"] = "error"
-                    changed = True
-            if changed:
-                storage.save_conversation(conv)
+        conversation_ids = await asyncio.to_thread(job_manager.read_pending_conversations)
+        if conversation_ids is None:
+            conversations = await asyncio.to_thread(storage.list_conversations)
+            conversation_ids = [conv_meta["id"] for conv_meta in conversations]
+        await asyncio.gather(*(
+            asyncio.to_thread(_fix_orphaned_messages, conversation_id)
+            for conversation_id in conversation_ids
+        ))
+        # No jobs are running yet, so this just resets the log
+        await job_manager.write_pending_log()
     except Exception:
         pass  # Best-effort on startup
 
@@ -50,45 +85,87 @@ async def _mark_orphaned_messages():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    load_config()
+    await asyncio.to_thread(load_config)
+    await asyncio.to_thread(job_manager.remove_stale_logs)
+    app.state.http_client = httpx.AsyncClient(timeout=30.0)
     await _mark_orphaned_messages()
     cleanup_task = asyncio.create_task(_periodic_cleanup())
+    warmup_task = asyncio.create_task(_warm_up())
     yield
     # Shutdown
+    await job_manager.write_pending_log()
+    warmup_task.cancel()
     cleanup_task.cancel()
     try:
         await cleanup_task
     except asyncio.CancelledError:
         pass
+    await app.state.http_client.aclose()
+    await openrouter.close_client()
+    await search.close_client()
 
 
 # --- Cached OpenRouter model list ---
 
 _models_cache: Dict[str, Any] = {"data": None, "fetched_at": 0.0}
 _MODELS_CACHE_TTL = 300  # 5 minutes
+_models_inflight: Optional[asyncio.Task] = None
 
 
-async def _fetch_openrouter_models():
-    """Fetch available models from OpenRouter, with 5-min cache."""
-    now = time.time()
-    if _models_cache["data"] is not None and (now - _models_cache["fetched_at"]) < _MODELS_CACHE_TTL:
-        return _models_cache["data"]
-
+async def _request_openrouter_models():
+    """Fetch the model list from OpenRouter and refresh the cache."""
     headers = {}
     if OPENROUTER_API_KEY:
         headers["Authorization"] = f"Bearer {OPENROUTER_API_KEY}"
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        resp = await client.get("https://openrouter.ai/api/v1/models", headers=headers)
-        resp.raise_for_status()
-        data = resp.json()
+    resp = await app.state.http_client.get("https://openrouter.ai/api/v1/models", headers=headers)
+    resp.raise_for_status()
+    data = resp.json()
 
     _models_cache["data"] = data
-    _models_cache["fetched_at"] = now
+    _models_cache["fetched_at"] = time.time()
     return data
 
 
-app = FastAPI(title="LLM Council API", lifespan=lifespan)
+def _clear_models_inflight(task: asyncio.Task):
+    global _models_inflight
+    if _models_inflight is task:
+        _models_inflight = None
+    if not task.cancelled():
+        task.exception()  # Mark retrieved even if every waiter went away
+
+
+async def _fetch_openrouter_models():
+    """
+    Fetch available models from OpenRouter, with 5-min cache.
+
+    Concurrent cache misses share a single upstream request; it is shielded
+    so one disconnecting caller doesn't cancel it for the others.
+    """
+    global _models_inflight
+    now = time.time()
+    if _models_cache["data"] is not None and (now - _models_cache["fetched_at"]) < _MODELS_CACHE_TTL:
+        return _models_cache["data"]
+
+    if _models_inflight is None:
+        _models_inflight = asyncio.create_task(_request_openrouter_models())
+        _models_inflight.add_done_callback(_clear_models_inflight)
+    return await asyncio.shield(_models_inflight)
+
+
+class _JSONResponse(JSONResponse):
+    """
+    JSON response that skips Pydantic validation and uses orjson if available.
+
+    Conversations come from our own storage, so read paths return them as-is
+    instead of re-validating every message through a response model.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content, compact=True)
+
+
+app = FastAPI(title="LLM Council API", lifespan=lifespan, default_response_class=_JSONResponse)
 
 # Enable CORS for local development
 app.add_middleware(
@@ -124,14 +201,6 @@ class ConversationMetadata(BaseModel):
     message_count: int
 
 
-class Conversation(BaseModel):
-    """Full conversation with all messages."""
-    id: str
-    created_at: str
-    title: str
-    messages: List[Dict[str, Any]]
-
-
 @app.get("/")
 async def root():
     """Health check endpoint."""
@@ -141,30 +210,30 @@ async def root():
 @app.get("/api/conversations", response_model=List[ConversationMetadata])
 async def list_conversations():
     """List all conversations (metadata only)."""
-    return storage.list_conversations()
+    return await asyncio.to_thread(storage.list_conversations)
 
 
-@app.post("/api/conversations", response_model=Conversation)
+@app.post("/api/conversations")
 async def create_conversation(request: CreateConversationRequest):
     """Create a new conversation."""
     conversation_id = str(uuid.uuid4())
-    conversation = storage.create_conversation(conversation_id)
-    return conversation
+    conversation = await asyncio.to_thread(storage.create_conversation, conversation_id)
+    return _JSONResponse(conversation)
 
 
-@app.get("/api/conversations/{conversation_id}", response_model=Conversation)
+@app.get("/api/conversations/{conversation_id}")
 async def get_conversation(conversation_id: str):
     """Get a specific conversation with all its messages."""
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await asyncio.to_thread(storage.get_conversation, conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return conversation
+    return _JSONResponse(conversation)
 
 
 @app.delete("/api/conversations/{conversation_id}")
 async def delete_conversation(conversation_id: str):
     """Delete a conversation."""
-    success = storage.delete_conversation(conversation_id)
+    success = await asyncio.to_thread(storage.delete_conversation, conversation_id)
     if not success:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return {"status": "success", "id": conversation_id}
@@ -194,7 +263,7 @@ async def put_config(request: UpdateConfigRequest):
     """Update council configuration."""
     if len(request.council_models) < 2:
         raise HTTPException(status_code=400, detail="At least 2 council models are required")
-    update_config(request.council_models, request.chairman_model)
+    await asyncio.to_thread(update_config, request.council_models, request.chairman_model)
     return {
         "council_models": get_council_models(),
         "chairman_model": get_chairman_model(),
@@ -207,23 +276,24 @@ async def send_message(conversation_id: str, request: SendMessageRequest):
     Send a message and run the 3-stage council process.
     Returns the complete response with all stages.
     """
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await asyncio.to_thread(storage.get_conversation, conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
     is_first_message = len(conversation["messages"]) == 0
 
-    storage.add_user_message(conversation_id, request.content)
+    await asyncio.to_thread(storage.add_user_message, conversation_id, request.content)
 
     if is_first_message:
         title = await generate_conversation_title(request.content)
-        storage.update_conversation_title(conversation_id, title)
+        await asyncio.to_thread(storage.update_conversation_title, conversation_id, title)
 
     stage1_results, stage2_results, stage3_result, metadata = await run_full_council(
         request.content
     )
 
-    storage.add_assistant_message(
+    await asyncio.to_thread(
+        storage.add_assistant_message,
         conversation_id,
         stage1_results,
         stage2_results,
@@ -240,35 +310,79 @@ async def send_message(conversation_id: str, request: SendMessageRequest):
 
 # --- Streaming with durable jobs ---
 
+# SSE comment sent while a reader is idle, so proxies don't drop the stream
+_KEEPALIVE_FRAME = b": keepalive\n\n"
+
 async def _stream_job_events(job, start_index: int = 0):
     """
     SSE generator that drains buffered events then goes live.
 
-    Supports multiple concurrent readers on the same job.
+    Supports multiple concurrent readers on the same job. Once caught up, a
+    reader subscribes its own queue and new frames are pushed straight to it.
     """
     idx = start_index
+    log_position = (0, 0)
 
     while True:
-        # Drain any buffered events
-        while idx < len(job.events):
-            event = job.events[idx]
-            idx += 1
-            yield f"data: {json.dumps(event)}\n\n"
-            # Stop after terminal event
-            if event.get("type") in ("complete", "error"):
-                return
-
-        # If job is already terminal and we've caught up, stop
-        if job.status in ("complete", "error"):
+        # Events older than the in-memory window are replayed from the job
+        # log, one bounded batch per write
+        if idx < job.events_head:
+            await job_manager.flush_log(job)
+            frames, log_position = await asyncio.to_thread(
+                job_manager.read_logged_events, job, idx, log_position
+            )
+            if not frames:
+                # Log is gone (job cleaned up); resume from what is in memory
+                idx = job.events_head
+            else:
+                idx += len(frames)
+                yield b"".join(frames)
+            if idx < job.events_head:
+                continue
+
+        # Drain any buffered events (already serialized as SSE frames),
+        # sending everything available as one write
+        while job.events_head <= idx < job.event_count:
+            batch = list(islice(job.events, idx - job.events_head, None))
+            idx += len(batch)
+            yield b"".join(batch)
+        if idx < job.events_head:
+            # The window moved past us while we were yielding
+            continue
+
+        # The terminal event is always the last one appended
+        if job.terminal:
             return
 
-        # Wait for new events with a timeout for keepalive
-        waiter = job.new_event
+        # Caught up with no await since the last check, so nothing is missed
+        queue = job_manager.subscribe(job)
         try:
-            await asyncio.wait_for(asyncio.shield(waiter.wait()), timeout=30.0)
-        except asyncio.TimeoutError:
-            # Send keepalive comment
-            yield ": keepalive\n\n"
+            while True:
+                try:
+                    frame = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    try:
+                        frame = await asyncio.wait_for(queue.get(), timeout=30.0)
+                    except asyncio.TimeoutError:
+                        yield _KEEPALIVE_FRAME
+                        continue
+                # Take whatever else is already queued so it goes out in one write
+                batch = []
+                while frame is not None:
+                    batch.append(frame)
+                    if queue.empty():
+                        break
+                    frame = queue.get_nowait()
+                if batch:
+                    idx += len(batch)
+                    yield b"".join(batch)
+                if frame is None:
+                    # Detached for falling behind; catch up from the window/log
+                    break
+                if job.terminal and idx >= job.event_count:
+                    return
+        finally:
+            job_manager.unsubscribe(job, queue)
 
 
 @app.post("/api/conversations/{conversation_id}/message/stream")
@@ -277,7 +391,7 @@ async def send_message_stream(conversation_id: str, request: SendMessageRequest)
     Send a message and stream the 3-stage council process via SSE.
     Spawns a background task so the pipeline survives client disconnects.
     """
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await asyncio.to_thread(storage.get_conversation, conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
@@ -290,12 +404,24 @@ async def send_message_stream(conversation_id: str, request: SendMessageRequest)
             headers={"X-Job-Id": existing.job_id},
         )
 
+    # Create the job straight after the check, with no await in between, so a
+    # concurrent request for this conversation gets the 409 above. The history
+    # we already loaded saves the pipeline from reloading it.
+    job = job_manager.create_job(
+        conversation_id, request.content, prior_messages=conversation["messages"]
+    )
+
     # Add user message to storage
-    storage.add_user_message(conversation_id, request.content)
+    try:
+        await asyncio.to_thread(storage.add_user_message, conversation_id, request.content)
+    except Exception as e:
+        # Release the conversation so it isn't stuck behind a job that never ran
+        job.status = "error"
+        job_manager.append_event(job, {"type": "error", "message": str(e)})
+        raise
 
-    # Create and start job (title generation is handled inside the pipeline)
-    job = job_manager.create_job(conversation_id, request.content)
-    job.task = asyncio.create_task(run_council_pipeline(job))
+    # Start job (title generation is handled inside the pipeline)
+    job.task = start_council_pipeline(job)
 
     return StreamingResponse(
         _stream_job_events(job, start_index=0),
@@ -318,7 +444,7 @@ async def get_job_status(conversation_id: str):
         "active": True,
         "job_id": job.job_id,
         "status": job.status,
-        "event_count": len(job.events),
+        "event_count": job.event_count,
     }
 
 
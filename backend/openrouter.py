@@ -1,14 +1,245 @@
 """OpenRouter API client for making LLM requests."""
 
 import asyncio
+import functools
+import json
 import time
 import httpx
+from importlib.util import find_spec
 from typing import List, Dict, Any, Optional
+
+try:
+    import tiktoken
+except ImportError:  # Optional; fall back to the ~4 chars per token estimate
+    tiktoken = None
+
 from .config import OPENROUTER_API_KEY, OPENROUTER_API_URL
+from .json_codec import json_dumps, json_loads
+from .llm_cache import llm_cache
+
+# Longest a tool call may run once it has a concurrency slot; calls still
+# running after this are cancelled and answered with an error so the model
+# isn't held up by one slow fetch
+TOOL_CALL_TIMEOUT = 45.0
+
+# Most tool calls running at once across all models, so a council-wide
+# fan-out can't flood Brave or the event loop
+TOOL_CONCURRENCY = 8
+_tool_semaphore = asyncio.Semaphore(TOOL_CONCURRENCY)
+
+# Request headers; the API key is fixed at import time
+_HEADERS = {
+    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+    "Content-Type": "application/json",
+}
+_STREAM_HEADERS = {**_HEADERS, "HTTP-Referer": "http://localhost:3000"}
+
+# Sent as the last message once the tool budget is exhausted. Using "user"
+# role because some providers ignore mid-conversation "system" messages.
+_BUDGET_EXHAUSTED_NOTE = {
+    "role": "user",
+    "content": "[SYSTEM NOTE] Your tool/search budget is exhausted. You MUST now provide your final answer using the information you have already gathered. Do NOT request any more tools. Write your complete response now."
+}
+
+# Providers that only reuse a prompt prefix when it carries an explicit
+# cache_control breakpoint; OpenAI models cache long prefixes automatically
+_PROMPT_CACHE_PREFIXES = ("anthropic/",)
+# Shortest prefix worth marking (providers don't cache anything shorter)
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+# HTTP/2 lets every council model's stream share one connection; httpx only
+# supports it when the optional h2 package is installed (httpx[http2])
+_HTTP2_AVAILABLE = find_spec("h2") is not None
+
+# Chunks buffered per query_models_stream_per_model() call before the
+# streaming models are made to wait for the consumer
+STREAM_QUEUE_MAX = 64
+
+# Non-streaming queries currently being sent, keyed like llm_cache
+_inflight: Dict[str, asyncio.Task] = {}
+
+# Shared client so connections to OpenRouter are kept alive and pooled
+# across requests; created lazily on first use, closed at app shutdown.
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared OpenRouter HTTP client, creating it if needed."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=_HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(120.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=200,
+                max_keepalive_connections=100,
+                keepalive_expiry=60,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    """Close the shared OpenRouter HTTP client."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _await_all(coros: list) -> list:
+    """
+    Await coroutines concurrently and return their results in order.
+
+    A single coroutine (one model, or one tool call in a round) is awaited
+    directly instead of being wrapped in a task by asyncio.gather.
+    """
+    if len(coros) == 1:
+        return [await coros[0]]
+    return await asyncio.gather(*coros)
+
+
+async def _iter_sse_data(response: httpx.Response):
+    """
+    Yield the data payloads of an SSE response, one list per network chunk.
+
+    Raw bytes are split on newlines in bulk rather than resuming a line
+    iterator per line; a partial trailing line is kept for the next chunk.
+    Stops at the "[DONE]" sentinel.
+    """
+    buffer = bytearray()
+    async for chunk in response.aiter_bytes():
+        buffer += chunk
+        end = buffer.rfind(b"\n")
+        if end == -1:
+            continue
+        lines = buffer[:end].split(b"\n")
+        del buffer[:end + 1]
+        payloads = []
+        for line in lines:
+            if line.startswith(b"data: "):
+                data = line[6:]
+                if data.strip() == b"[DONE]":
+                    if payloads:
+                        yield payloads
+                    return
+                payloads.append(data)
+        if payloads:
+            yield payloads
+    if buffer.startswith(b"data: ") and buffer[6:].strip() != b"[DONE]":
+        yield [buffer[6:]]
+
+
+# tiktoken encoding name -> encoder, filled off the event loop by
+# load_token_encoders(); count_tokens() never loads one itself
+_encoders: Dict[str, Any] = {}
+
+
+def _encoding_name(model: Optional[str]) -> str:
+    """tiktoken encoding for a model id (cl100k_base for non-OpenAI models)."""
+    name = model.split("/")[-1] if model else ""
+    try:
+        return tiktoken.encoding_name_for_model(name)
+    except KeyError:
+        return "cl100k_base"
+
+
+def load_token_encoders(models: List[str]):
+    """
+    Load the tiktoken encoders used by count_tokens() for the given models.
+
+    Blocking (BPE files are downloaded on first use), so run it in a worker
+    thread. Does nothing when tiktoken isn't installed.
+
+    Args:
+        models: OpenRouter model identifiers
+    """
+    if tiktoken is None:
+        return
+    for encoding in {_encoding_name(model) for model in models} | {"cl100k_base"}:
+        if encoding in _encoders:
+            continue
+        try:
+            _encoders[encoding] = tiktoken.get_encoding(encoding)
+        except Exception:  # BPE ranks may be unreachable (e.g. offline)
+            print(f"tiktoken encoding {encoding} unavailable; estimating token counts")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count tokens exactly with a preloaded tiktoken encoder.
+
+    Falls back to _estimate_tokens() when tiktoken isn't installed or the
+    model's encoder hasn't been loaded, so it never blocks on a download.
+    """
+    encoder = _encoders.get(_encoding_name(model)) if tiktoken is not None else None
+    if encoder is None:
+        return _estimate_tokens(text)
+    return max(1, len(encoder.encode(text, disallowed_special=())))
+
+
+def _with_cache_breakpoint(model: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Mark a request's reusable prompt prefix for provider-side prompt caching.
+
+    The last user message (other than the budget note) ends the prefix that
+    repeats across tool rounds and turns, so it is sent as a text block with
+    an ephemeral cache_control breakpoint once the prefix is long enough to
+    be cached (counted exactly near the threshold). The caller's messages
+    are left unchanged.
+
+    Args:
+        model: OpenRouter model identifier
+        messages: Messages about to be sent
+
+    Returns:
+        messages itself if nothing was marked, otherwise a shallow copy
+    """
+    if not model.startswith(_PROMPT_CACHE_PREFIXES):
+        return messages
+
+    mark = None
+    prefix_chars = marked_chars = 0
+    for i, msg in enumerate(messages):
+        content = msg.get("content")
+        if not isinstance(content, str):
+            continue
+        prefix_chars += len(content)
+        if msg.get("role") in ("user", "system") and msg is not _BUDGET_EXHAUSTED_NOTE:
+            mark, marked_chars = i, prefix_chars
+    if mark is None or marked_chars // 4 < PROMPT_CACHE_MIN_TOKENS // 2:
+        return messages
+    if marked_chars // 4 < PROMPT_CACHE_MIN_TOKENS * 2:
+        # Near the threshold the chars/4 estimate isn't reliable; count exactly
+        prefix_tokens = sum(
+            count_tokens(msg["content"], model)
+            for msg in messages[:mark + 1]
+            if isinstance(msg.get("content"), str)
+        )
+        if prefix_tokens < PROMPT_CACHE_MIN_TOKENS:
+            return messages
+
+    marked = list(messages)
+    marked[mark] = {
+        **messages[mark],
+        "content": [{
+            "type": "text",
+            "text": messages[mark]["content"],
+            "cache_control": {"type": "ephemeral"},
+        }],
+    }
+    return marked
+
+
+def _cached_tokens(usage: Optional[Dict[str, Any]]) -> int:
+    """Prompt tokens served from the provider's prompt cache, per a usage dict."""
+    if not usage:
+        return 0
+    return (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
 
 
 def _estimate_tokens(text: str) -> int:
-    """Estimate token count (~4 chars per token for English text)."""
+    """Estimate token count (~4 chars per token for English text); cheap enough for logging."""
     return max(1, len(text) // 4)
 
 
@@ -17,6 +248,50 @@ def _msgs_tokens(messages: list) -> int:
     return sum(_estimate_tokens(m.get("content", "")) for m in messages)
 
 
+async def _request_model(
+    model: str,
+    messages: List[Dict[str, str]],
+    timeout: float,
+    cache_key: str,
+) -> Optional[Dict[str, Any]]:
+    """POST a non-streaming query to OpenRouter and cache a successful response."""
+    payload = {
+        "model": model,
+        "messages": _with_cache_breakpoint(model, messages),
+    }
+
+    try:
+        response = await get_client().post(
+            OPENROUTER_API_URL,
+            headers=_HEADERS,
+            content=json_dumps(payload),
+            timeout=timeout,
+        )
+        response.raise_for_status()
+
+        data = json_loads(response.content)
+        message = data['choices'][0]['message']
+        cached_tokens = _cached_tokens(data.get('usage'))
+        if cached_tokens:
+            print(f"[{model}] Prompt cache hit: {cached_tokens} input tokens")
+
+        result = {
+            'content': message.get('content'),
+            'reasoning_details': message.get('reasoning_details')
+        }
+        llm_cache.set(cache_key, result)
+        return result
+
+    except Exception as e:
+        print(f"Error querying model {model}: {e}")
+        return None
+
+
+def _clear_inflight(cache_key: str, task: asyncio.Task):
+    if _inflight.get(cache_key) is task:
+        del _inflight[cache_key]
+
+
 async def query_model(
     model: str,
     messages: List[Dict[str, str]],
@@ -25,6 +300,10 @@ async def query_model(
     """
     Query a single model via OpenRouter API.
 
+    Identical requests are answered from llm_cache while the cached response
+    is fresh; failed queries are not cached. Identical requests made while
+    one is still in flight share its result instead of sending another POST.
+
     Args:
         model: OpenRouter model identifier (e.g., "openai/gpt-4o")
         messages: List of message dicts with 'role' and 'content'
@@ -33,36 +312,19 @@ async def query_model(
     Returns:
         Response dict with 'content' and optional 'reasoning_details', or None if failed
     """
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
-    payload = {
-        "model": model,
-        "messages": messages,
-    }
-
-    try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                OPENROUTER_API_URL,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-
-            data = response.json()
-            message = data['choices'][0]['message']
-
-            return {
-                'content': message.get('content'),
-                'reasoning_details': message.get('reasoning_details')
-            }
+    cache_key = llm_cache.make_key(model, messages)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-    except Exception as e:
-        print(f"Error querying model {model}: {e}")
-        return None
+    task = _inflight.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(_request_model(model, messages, timeout, cache_key))
+        _inflight[cache_key] = task
+        task.add_done_callback(functools.partial(_clear_inflight, cache_key))
+    # Shielded so one cancelled caller doesn't cancel the request for the others
+    result = await asyncio.shield(task)
+    return dict(result) if result is not None else None
 
 
 async def query_models_parallel(
@@ -79,13 +341,8 @@ async def query_models_parallel(
     Returns:
         Dict mapping model identifier to response dict (or None if failed)
     """
-    import asyncio
-
-    # Create tasks for all models
-    tasks = [query_model(model, messages) for model in models]
-
-    # Wait for all to complete
-    responses = await asyncio.gather(*tasks)
+    # Query all models concurrently and wait for all to complete
+    responses = await _await_all([query_model(model, messages) for model in models])
 
     # Map models to their responses
     return {model: response for model, response in zip(models, responses)}
@@ -107,17 +364,12 @@ async def query_model_stream(
     final response (after all tool use is complete). Intermediate
     preamble content (before tool calls) is NOT yielded.
     """
-    import json
-
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "http://localhost:3000",
-    }
-
     max_tool_rounds = 5
     tool_round_count = 0
-    conversation = list(messages)
+    # Copied on the first tool round, so the caller's list is never mutated
+    conversation = messages
+    # Reused across tool rounds; only messages and tools change per request
+    payload: Dict[str, Any] = {"model": model, "messages": conversation, "stream": True}
     t0 = time.time()
 
     def _log(msg: str):
@@ -134,73 +386,75 @@ async def query_model_stream(
         is_final = not offer_tools
 
         request_messages = conversation
-        if is_final and tool_round_count > 0:
+        nudged = is_final and tool_round_count > 0
+        if nudged:
             _log(f"Tool budget exhausted after {tool_round_count} rounds, requesting final answer...")
-            # Add a user-role nudge so the model knows it must answer now.
-            # Using "user" role because some providers ignore mid-conversation "system" messages.
-            request_messages = conversation + [{
-                "role": "user",
-                "content": "[SYSTEM NOTE] Your tool/search budget is exhausted. You MUST now provide your final answer using the information you have already gathered. Do NOT request any more tools. Write your complete response now."
-            }]
-
-        payload = {
-            "model": model,
-            "messages": request_messages,
-            "stream": True,
-        }
+            # Add a user-role nudge so the model knows it must answer now; it is
+            # appended in place and popped once the request has been streamed
+            conversation.append(_BUDGET_EXHAUSTED_NOTE)
+
+        payload["messages"] = _with_cache_breakpoint(model, conversation)
         if offer_tools:
             payload["tools"] = offer_tools
+        else:
+            payload.pop("tools", None)
 
         try:
             accumulated_content = ""
+            cached_tokens = 0
             tool_calls_by_index: Dict[int, Dict[str, Any]] = {}
 
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                async with client.stream("POST", OPENROUTER_API_URL, headers=headers, json=payload) as response:
-                    response.raise_for_status()
-                    async for line in response.aiter_lines():
-                        if line.startswith("data: "):
-                            data_str = line[6:]
-                            if data_str.strip() == "[DONE]":
-                                break
-                            try:
-                                data = json.loads(data_str)
-                                if 'choices' not in data or len(data['choices']) == 0:
-                                    continue
-                                choice = data['choices'][0]
-                                delta = choice.get('delta', {})
-
-                                # Accumulate content chunks
-                                content = delta.get('content')
-                                if content:
-                                    accumulated_content += content
-                                    # Only stream to caller on the final round
-                                    if is_final:
-                                        yield content
-
-                                # Accumulate tool call deltas
-                                if delta.get('tool_calls'):
-                                    for tc_delta in delta['tool_calls']:
-                                        idx = tc_delta.get('index', 0)
-                                        if idx not in tool_calls_by_index:
-                                            tool_calls_by_index[idx] = {
-                                                'id': tc_delta.get('id', ''),
-                                                'function': {
-                                                    'name': '',
-                                                    'arguments': ''
-                                                }
-                                            }
-                                        tc = tool_calls_by_index[idx]
-                                        if tc_delta.get('id'):
-                                            tc['id'] = tc_delta['id']
-                                        fn = tc_delta.get('function', {})
-                                        if fn.get('name'):
-                                            tc['function']['name'] += fn['name']
-                                        if fn.get('arguments'):
-                                            tc['function']['arguments'] += fn['arguments']
-
-                            except json.JSONDecodeError:
+            async with get_client().stream(
+                "POST", OPENROUTER_API_URL, headers=_STREAM_HEADERS, content=json_dumps(payload), timeout=timeout
+            ) as response:
+                response.raise_for_status()
+                async for payloads in _iter_sse_data(response):
+                    for data_str in payloads:
+                        try:
+                            data = json_loads(data_str)
+                            if data.get('usage'):
+                                cached_tokens = _cached_tokens(data['usage'])
+                            if 'choices' not in data or len(data['choices']) == 0:
                                 continue
+                            choice = data['choices'][0]
+                            delta = choice.get('delta', {})
+
+                            # Accumulate content chunks
+                            content = delta.get('content')
+                            if content:
+                                accumulated_content += content
+                                # Only stream to caller on the final round
+                                if is_final:
+                                    yield content
+
+                            # Accumulate tool call deltas
+                            if delta.get('tool_calls'):
+                                for tc_delta in delta['tool_calls']:
+                                    idx = tc_delta.get('index', 0)
+                                    if idx not in tool_calls_by_index:
+                                        tool_calls_by_index[idx] = {
+                                            'id': tc_delta.get('id', ''),
+                                            'function': {
+                                                'name': '',
+                                                'arguments': ''
+                                            }
+                                        }
+                                    tc = tool_calls_by_index[idx]
+                                    if tc_delta.get('id'):
+                                        tc['id'] = tc_delta['id']
+                                    fn = tc_delta.get('function', {})
+                                    if fn.get('name'):
+                                        tc['function']['name'] += fn['name']
+                                    if fn.get('arguments'):
+                                        tc['function']['arguments'] += fn['arguments']
+
+                        except (json.JSONDecodeError, UnicodeDecodeError):
+                            continue
+
+            if nudged:
+                conversation.pop()
+            if cached_tokens:
+                _log(f"Prompt cache hit: {cached_tokens} input tokens")
 
             # If no tool calls were accumulated, we're done
             if not tool_calls_by_index or not tool_executor:
@@ -235,6 +489,8 @@ async def query_model_stream(
                 }
                 for tc in sorted_calls
             ]
+            if conversation is messages:
+                conversation = list(messages)
             conversation.append(assistant_msg)
 
             # Execute all tool calls in parallel
@@ -242,22 +498,40 @@ async def query_model_stream(
                 fn_name = tc['function']['name']
                 fn_args = tc['function']['arguments']
                 try:
-                    args_preview = json.loads(fn_args) if fn_args else {}
+                    args_preview = json_loads(fn_args) if fn_args else {}
                 except json.JSONDecodeError:
                     args_preview = fn_args
-                _log(f"  Executing {fn_name}({args_preview})")
-                result = await tool_executor(fn_name, fn_args)
+                async with _tool_semaphore:
+                    # The deadline starts once a slot is free, so time queued
+                    # behind other models' tools isn't reported as a timeout
+                    _log(f"  Executing {fn_name}({args_preview})")
+                    started = time.time()
+                    try:
+                        result = await asyncio.wait_for(tool_executor(fn_name, fn_args), TOOL_CALL_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        _log(f"  {fn_name} timed out after {TOOL_CALL_TIMEOUT:.0f}s")
+                        return tc['id'], f"Error: {fn_name} timed out after {TOOL_CALL_TIMEOUT:.0f} seconds."
+                    except Exception as e:
+                        _log(f"  {fn_name} failed: {e}")
+                        return tc['id'], f"Error: {fn_name} failed: {e}"
                 result_tokens = _estimate_tokens(result) if result else 0
-                _log(f"  {fn_name} → ~{result_tokens} tokens")
+                _log(f"  {fn_name} → ~{result_tokens} tokens in {time.time() - started:.1f}s")
                 return tc['id'], result
 
-            results = await asyncio.gather(*[_exec_tool(tc) for tc in sorted_calls])
-            for tool_call_id, result in results:
-                conversation.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call_id,
-                    "content": result
-                })
+            # Record results in completion order; tool messages are matched
+            # by tool_call_id, so their order doesn't matter to the model
+            tool_tasks = [asyncio.ensure_future(_exec_tool(tc)) for tc in sorted_calls]
+            try:
+                for next_done in asyncio.as_completed(tool_tasks):
+                    tool_call_id, result = await next_done
+                    conversation.append({
+                        "role": "tool",
+                        "tool_call_id": tool_call_id,
+                        "content": result
+                    })
+            finally:
+                for task in tool_tasks:
+                    task.cancel()
 
             conv_tokens = _msgs_tokens(conversation)
             _log(f"Round {tool_round_count} complete, sending back to model ({len(conversation)} msgs, ~{conv_tokens} tokens)")
@@ -320,31 +594,42 @@ async def query_models_stream_per_model(
     Query multiple models in parallel with streaming, each with its own messages.
     Yields (model, chunk) tuples.
 
+    The queue is bounded, so a model streaming faster than the caller
+    consumes waits instead of buffering its whole response.
+
     Args:
         model_messages: Dict mapping model identifier to its own message list
     """
-    import asyncio
-
-    queue = asyncio.Queue()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_MAX)
+    done = object()
 
     async def worker(model, messages):
         try:
             async for chunk in query_model_stream(model, messages, tools=tools, tool_executor=tool_executor):
                 if chunk is not None:
                     await queue.put((model, chunk))
-        finally:
-            await queue.put((model, None))
+        except asyncio.CancelledError:
+            # The consumer went away; nobody is waiting for the done marker
+            raise
+        except Exception:
+            await queue.put((model, done))
+            raise
+        await queue.put((model, done))
 
     tasks = [asyncio.create_task(worker(m, msgs)) for m, msgs in model_messages.items()]
+    live = set(model_messages)
 
-    active_workers = len(model_messages)
-
-    while active_workers > 0:
-        item = await queue.get()
-        model, chunk = item
-        if chunk is None:
-            active_workers -= 1
-        else:
-            yield model, chunk
-
-    await asyncio.gather(*tasks)
+    try:
+        while live:
+            model, chunk = await queue.get()
+            if chunk is done:
+                live.discard(model)
+            else:
+                yield model, chunk
+
+        await asyncio.gather(*tasks)
+    finally:
+        # Workers blocked on a full queue would otherwise wait forever if the
+        # caller stops iterating early
+        for task in tasks:
+            task.cancel()
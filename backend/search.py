@@ -1,14 +1,92 @@
 """Brave Search and web fetch tools for LLM Council models."""
 
+import asyncio
+import html
 import logging
+import re
 import httpx
+from httpx._utils import get_environment_proxies
 import json
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # Optional speedup; fall back to regex stripping
+    LexborHTMLParser = None
+
 from .config import BRAVE_SEARCH_API_KEY
+from .json_codec import json_loads
+from .search_cache import search_cache
 
 logger = logging.getLogger(__name__)
 
 # Max characters to return from a fetched page
 FETCH_MAX_CHARS = 20000
+# Most bytes read from a fetched page; the rest of the body is never downloaded
+FETCH_MAX_BYTES = FETCH_MAX_CHARS * 4
+
+# Most page fetches in flight at once; each may hold a connection for 30s
+FETCH_CONCURRENCY = 4
+_fetch_semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+# Fetched pages that carried an ETag or Last-Modified header, revalidated
+# with a conditional GET on the next fetch:
+# url -> (etag, last_modified, processed text), least recently used first
+FETCH_CACHE_MAX_ENTRIES = 128
+_url_cache: "OrderedDict[str, Tuple[Optional[str], Optional[str], str]]" = OrderedDict()
+
+# Shared client for Brave and fetched pages, so keep-alive connections are
+# reused across tool calls; created lazily, closed at app shutdown.
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _cache_page(url: str, entry: Tuple[Optional[str], Optional[str], str]):
+    """Store a fetched page as the most recent entry, evicting the oldest."""
+    _url_cache[url] = entry
+    _url_cache.move_to_end(url)
+    while len(_url_cache) > FETCH_CACHE_MAX_ENTRIES:
+        _url_cache.popitem(last=False)
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared search/fetch HTTP client, creating it if needed."""
+    global _client
+    if _client is None or _client.is_closed:
+        # Host lookups only happen when a new connection is opened, so
+        # long-lived keep-alive connections double as a DNS cache; a failed
+        # connect (including resolution) is retried once
+        def transport(proxy: Optional[str] = None) -> httpx.AsyncHTTPTransport:
+            return httpx.AsyncHTTPTransport(
+                retries=1,
+                proxy=proxy,
+                limits=httpx.Limits(
+                    max_connections=100,
+                    max_keepalive_connections=50,
+                    keepalive_expiry=60,
+                ),
+            )
+
+        # httpx ignores HTTP(S)_PROXY / ALL_PROXY once a transport is given,
+        # so mount the environment's proxies explicitly (None entries are
+        # NO_PROXY hosts, which use the direct transport)
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            transport=transport(),
+            mounts={
+                pattern: transport(proxy) if proxy else None
+                for pattern, proxy in get_environment_proxies().items()
+            },
+        )
+    return _client
+
+
+async def close_client():
+    """Close the shared search/fetch HTTP client."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
 
 # OpenAI-compatible tool definitions
 SEARCH_TOOLS = [
@@ -53,6 +131,9 @@ async def brave_search(query: str) -> str:
     """
     Search the web using Brave's LLM Context API.
 
+    Results are cached in search_cache, which also answers paraphrases of a
+    cached query when embeddings are available.
+
     Args:
         query: The search query string
 
@@ -62,8 +143,6 @@ async def brave_search(query: str) -> str:
     if not BRAVE_SEARCH_API_KEY:
         logger.error("BRAVE_SEARCH_API_KEY is not configured")
         return "Error: BRAVE_SEARCH_API_KEY is not configured."
-    
-    logger.info(f"Brave search initiated: {query}")
 
     url = "https://api.search.brave.com/res/v1/llm/context"
     headers = {
@@ -74,10 +153,15 @@ async def brave_search(query: str) -> str:
     params = {"q": query}
 
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            data = response.json()
+        cached, embedding = await search_cache.lookup(query)
+        if cached is not None:
+            logger.info(f"Brave search served from cache: {query}")
+            return cached
+
+        logger.info(f"Brave search initiated: {query}")
+        response = await get_client().get(url, headers=headers, params=params, timeout=15.0)
+        response.raise_for_status()
+        data = json_loads(response.content)
 
         # The LLM context API returns a summarized context string
         # Format varies but typically includes web results
@@ -96,10 +180,13 @@ async def brave_search(query: str) -> str:
                 parts.append(f"{i}. {title}\n   URL: {url_str}\n   {description}")
 
         if parts:
-            return "\n\n".join(parts)
+            result = "\n\n".join(parts)
+        else:
+            # Fallback: return raw response text if structure is unexpected
+            result = json.dumps(data, indent=2)[:3000]
 
-        # Fallback: return raw response text if structure is unexpected
-        return json.dumps(data, indent=2)[:3000]
+        search_cache.store(query, result, embedding)
+        return result
 
     except httpx.HTTPStatusError as e:
         logger.error(f"Brave Search HTTP error: {e.response.status_code} - {e.response.text[:200]}")
@@ -114,6 +201,9 @@ async def fetch_url(url: str) -> str:
     Fetch the text content of a URL.
 
     Handles plain text directly and strips HTML to plain text for web pages.
+    At most FETCH_MAX_BYTES of the body are downloaded. Previously fetched
+    pages are revalidated with If-None-Match / If-Modified-Since, and a 304
+    reuses the cached text.
 
     Args:
         url: The URL to fetch
@@ -122,26 +212,56 @@ async def fetch_url(url: str) -> str:
         Page content as plain text, truncated to FETCH_MAX_CHARS
     """
     logger.info(f"Fetching URL: {url}")
+    headers = {
+        "User-Agent": "LLM-Council/1.0 (web fetch tool)",
+        "Accept": "text/plain, text/html, text/markdown, application/json, */*",
+    }
+    cached = _url_cache.get(url)
+    if cached is not None:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
     try:
-        async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-            response = await client.get(url, headers={
-                "User-Agent": "LLM-Council/1.0 (web fetch tool)",
-                "Accept": "text/plain, text/html, text/markdown, application/json, */*",
-            })
+        async with _fetch_semaphore, get_client().stream(
+            "GET", url, headers=headers, follow_redirects=True, timeout=30.0
+        ) as response:
+            if response.status_code == 304 and cached is not None:
+                # Concurrent fetches may have evicted the entry meanwhile
+                _cache_page(url, cached)
+                logger.info(f"Fetched {url}: not modified, using cached copy")
+                return cached[2]
             response.raise_for_status()
 
-            content_type = response.headers.get("content-type", "")
-            text = response.text
+            body = bytearray()
+            truncated = False
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) >= FETCH_MAX_BYTES:
+                    truncated = True
+                    break
+
+        content_type = response.headers.get("content-type", "")
+        text = body.decode(response.encoding or "utf-8", errors="replace")
+
+        # For HTML, do a lightweight strip to plain text
+        if "text/html" in content_type:
+            text = _strip_html(text)
 
-            # For HTML, do a lightweight strip to plain text
-            if "text/html" in content_type:
-                text = _strip_html(text)
+        if truncated or len(text) > FETCH_MAX_CHARS:
+            text = text[:FETCH_MAX_CHARS] + "\n\n[...truncated]"
 
-            if len(text) > FETCH_MAX_CHARS:
-                text = text[:FETCH_MAX_CHARS] + "\n\n[...truncated]"
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if etag or last_modified:
+            _cache_page(url, (etag, last_modified, text))
+        else:
+            _url_cache.pop(url, None)
 
-            logger.info(f"Fetched {len(text)} chars from {url}")
-            return text
+        logger.info(f"Fetched {len(text)} chars from {url}")
+        return text
 
     except httpx.HTTPStatusError as e:
         logger.error(f"Fetch URL HTTP error: {e.response.status_code} for {url}")
@@ -151,23 +271,76 @@ async def fetch_url(url: str) -> str:
         return f"Fetch error: {e}"
 
 
-def _strip_html(html: str) -> str:
-    """Lightweight HTML to plain text conversion."""
-    import re
-    # Remove script and style blocks
-    text = re.sub(r'<(script|style)[^>]*>.*?</\1>', '', html, flags=re.DOTALL | re.IGNORECASE)
-    # Replace block tags with newlines
-    text = re.sub(r'<(br|p|div|h[1-6]|li|tr)[^>]*/?>', '\n', text, flags=re.IGNORECASE)
-    # Strip remaining tags
-    text = re.sub(r'<[^>]+>', '', text)
-    # Decode common entities
-    text = text.replace('&amp;', '&').replace('&lt;', '<').replace('&gt;', '>').replace('&nbsp;', ' ').replace('&#39;', "'").replace('&quot;', '"')
+_RE_SCRIPT_STYLE = re.compile(r'<(script|style)[^>]*>.*?</\1>', re.DOTALL | re.IGNORECASE)
+_RE_BLOCK = re.compile(r'<(br|p|div|h[1-6]|li|tr)[^>]*/?>', re.IGNORECASE)
+_RE_TAG = re.compile(r'<[^>]+>')
+_RE_WS = re.compile(r'[ \t]+')
+_RE_NL = re.compile(r'\n{3,}')
+# Same block tags as _RE_BLOCK, for the selectolax path
+_BLOCK_SELECTOR = 'br,p,div,h1,h2,h3,h4,h5,h6,li,tr'
+
+
+def _strip_html(markup: str) -> str:
+    """
+    Lightweight HTML to plain text conversion.
+
+    Uses selectolax's lexbor parser when installed (linear time, native code);
+    otherwise falls back to regex stripping.
+    """
+    if LexborHTMLParser is not None:
+        tree = LexborHTMLParser(markup)
+        for node in tree.css('script,style'):
+            node.decompose()
+        # Break lines only at block tags, like the regex path; inline text
+        # nodes (<a>, <b>, <span>) are joined as-is
+        for node in tree.css(_BLOCK_SELECTOR):
+            node.insert_before('\n')
+        text = tree.body.text(deep=True, separator='') if tree.body else ''
+    else:
+        # Remove script and style blocks
+        text = _RE_SCRIPT_STYLE.sub('', markup)
+        # Replace block tags with newlines
+        text = _RE_BLOCK.sub('\n', text)
+        # Strip remaining tags
+        text = _RE_TAG.sub('', text)
+        text = html.unescape(text)
+    # Keep &nbsp; as a plain space so it collapses below
+    text = text.replace('\xa0', ' ')
     # Collapse whitespace
-    text = re.sub(r'[ \t]+', ' ', text)
-    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = _RE_WS.sub(' ', text)
+    text = _RE_NL.sub('\n\n', text)
     return text.strip()
 
 
+async def _run_web_search(args: dict) -> str:
+    query = args.get("query", "")
+    if not query:
+        logger.warning("web_search called with empty query")
+        return "Error: No search query provided."
+    logger.debug(f"[Tool] web_search: {query}")
+    result = await brave_search(query)
+    logger.debug(f"[Tool] web_search result length: {len(result)}")
+    return result
+
+
+async def _run_fetch_url(args: dict) -> str:
+    url = args.get("url", "")
+    if not url:
+        logger.warning("fetch_url called with empty URL")
+        return "Error: No URL provided."
+    logger.debug(f"[Tool] fetch_url: {url}")
+    result = await fetch_url(url)
+    logger.debug(f"[Tool] fetch_url result length: {len(result)}")
+    return result
+
+
+# Tool name -> handler taking the parsed arguments
+_TOOL_HANDLERS = {
+    "web_search": _run_web_search,
+    "fetch_url": _run_fetch_url,
+}
+
+
 async def execute_search_tool(name: str, arguments: str) -> str:
     """
     Execute a tool call by name.
@@ -180,7 +353,7 @@ async def execute_search_tool(name: str, arguments: str) -> str:
         Tool result as a string
     """
     try:
-        args = json.loads(arguments) if isinstance(arguments, str) else arguments
+        args = json_loads(arguments) if isinstance(arguments, str) else arguments
     except json.JSONDecodeError:
         logger.error(f"Invalid JSON arguments for tool {name}: {arguments}")
         return f"Error: Invalid JSON arguments for {name}."
@@ -190,26 +363,8 @@ async def execute_search_tool(name: str, arguments: str) -> str:
 
     logger.info(f"Executing tool '{name}' with args {args}")
 
-    if name == "web_search":
-        query = args.get("query", "")
-        if not query:
-            logger.warning("web_search called with empty query")
-            return "Error: No search query provided."
-        logger.debug(f"[Tool] web_search: {query}")
-        result = await brave_search(query)
-        logger.debug(f"[Tool] web_search result length: {len(result)}")
-        return result
-
-    elif name == "fetch_url":
-        url = args.get("url", "")
-        if not url:
-            logger.warning("fetch_url called with empty URL")
-            return "Error: No URL provided."
-        logger.debug(f"[Tool] fetch_url: {url}")
-        result = await fetch_url(url)
-        logger.debug(f"[Tool] fetch_url result length: {len(result)}")
-        return result
-
-    else:
+    handler = _TOOL_HANDLERS.get(name)
+    if handler is None:
         logger.warning(f"Attempted to execute unknown search tool '{name}'")
         return f"Error: Unknown tool '{name}'."
+    return await handler(args)
@@ -0,0 +1,159 @@
+"""Cache of web search results that also matches paraphrased queries."""
+
+import asyncio
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from importlib.util import find_spec
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Most results kept, and how long (seconds) a cached result stays valid
+SEARCH_CACHE_MAX_ENTRIES = 256
+SEARCH_CACHE_TTL = 3600.0
+
+# Cosine similarity at which two queries are treated as the same search
+SEARCH_CACHE_SIMILARITY = 0.92
+SEARCH_CACHE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize(query: str) -> str:
+    return _WHITESPACE_RE.sub(" ", query).strip().lower()
+
+
+class SearchCache:
+    """
+    LRU cache of search results keyed by normalized query, with a TTL.
+
+    When sentence-transformers is installed, queries are also embedded and a
+    miss falls back to the most similar cached query, so paraphrases such as
+    "capital of France" / "France's capital" share one result. Embeddings
+    live in a single float32 matrix of unit rows, so a lookup is one
+    matrix-vector product.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+        ttl: float = SEARCH_CACHE_TTL,
+        similarity: float = SEARCH_CACHE_SIMILARITY,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        # normalized query -> (expires_at, result), least recently used first
+        self._results: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+        self._semantic = find_spec("sentence_transformers") is not None
+        self._model: Any = None
+        self._model_lock = threading.Lock()
+        # Ring buffer of embeddings; row i belongs to _row_keys[i]
+        self._embeddings: Any = None
+        self._row_keys: List[Optional[str]] = [None] * max_entries
+        self._next_row = 0
+
+    def _get_result(self, key: str) -> Optional[str]:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._results[key]
+            return None
+        self._results.move_to_end(key)
+        return result
+
+    def load_model(self) -> bool:
+        """
+        Load the embedding model if needed (blocking; may download it).
+
+        The app calls this in a worker thread at startup so the first search
+        doesn't pay for it inside a tool round.
+
+        Returns:
+            True if embeddings are available
+        """
+        with self._model_lock:
+            if self._model is None:
+                if not self._semantic:
+                    return False
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(SEARCH_CACHE_MODEL)
+                except Exception:
+                    logger.exception("Search cache embeddings unavailable; using exact matches only")
+                    self._semantic = False
+                    return False
+        return True
+
+    def _embed(self, text: str) -> Any:
+        """Embed text as a unit vector (blocking); None if embeddings are unavailable."""
+        if not self.load_model():
+            return None
+        return self._model.encode(text, normalize_embeddings=True, convert_to_numpy=True)
+
+    async def lookup(self, query: str) -> Tuple[Optional[str], Any]:
+        """
+        Find a cached result for a query.
+
+        Args:
+            query: The search query
+
+        Returns:
+            (result or None, query embedding or None); pass the embedding to
+            store() on a miss so the query isn't embedded twice
+        """
+        key = _normalize(query)
+        result = self._get_result(key)
+        if result is not None or not self._semantic:
+            return result, None
+
+        try:
+            embedding = await asyncio.to_thread(self._embed, key)
+            if embedding is None or self._embeddings is None:
+                return None, embedding
+
+            scores = self._embeddings @ embedding
+            best = int(scores.argmax())
+        except Exception:
+            # A semantic miss is still an exact-match miss; don't fail the search
+            logger.exception(f"Search cache similarity lookup failed for '{query}'")
+            return None, None
+
+        best_key = self._row_keys[best]
+        if scores[best] >= self.similarity and best_key is not None:
+            result = self._get_result(best_key)
+            if result is not None:
+                logger.info(f"Search cache matched '{query}' to '{best_key}' ({scores[best]:.3f})")
+        return result, embedding
+
+    def store(self, query: str, result: str, embedding: Any = None):
+        """Cache a result, evicting the least recently used entry if full."""
+        key = _normalize(query)
+        self._results[key] = (time.monotonic() + self.ttl, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+        if embedding is None:
+            return
+        try:
+            if self._embeddings is None:
+                import numpy as np
+                self._embeddings = np.zeros((self.max_entries, embedding.shape[0]), dtype=np.float32)
+            row = self._next_row
+            self._embeddings[row] = embedding
+        except Exception:
+            logger.exception(f"Search cache couldn't index '{query}'; exact matches still work")
+            return
+        self._row_keys[row] = key
+        self._next_row = (row + 1) % self.max_entries
+
+
+# Singleton
+search_cache = SearchCache()
@@ -1,24 +1,185 @@
-"""JSON-based storage for conversations."""
+"""JSON-based storage for conversations.
 
+Each conversation lives in its own directory:
+
+    {DATA_DIR}/{id}/meta.json       - id, created_at, title, message_count
+    {DATA_DIR}/{id}/messages.jsonl  - one JSON message per line
+
+Appending a message only touches the tail of messages.jsonl. Updates to the
+in-progress assistant message are appended as superseding lines with the
+same job_id, and readers keep the last of them, so per-stage saves cost
+O(latest message) rather than O(history) and never remove saved data. The
+superseded lines are compacted away once the job finishes. Conversations stored in
+the older single-file layout ({DATA_DIR}/{id}.json) are still readable and
+are migrated on their next write.
+"""
+
+import functools
 import json
 import os
+import shutil
 import tempfile
+import threading
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 from .config import DATA_DIR
 
+_META_FILE = "meta.json"
+_MESSAGES_FILE = "messages.jsonl"
+_TAIL_READ_BLOCK = 64 * 1024
+_TERMINAL_STATUSES = ("complete", "error")
+
+# Storage calls run in worker threads (asyncio.to_thread), so writes are
+# serialized; readers tolerate a torn final line instead of taking the lock,
+# since writes either append or atomically replace a file.
+_write_lock = threading.RLock()
+
+
+def _serialized(func):
+    """Run a storage write while holding the module write lock."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _write_lock:
+            return func(*args, **kwargs)
+    return wrapper
+
 
 def ensure_data_dir():
     """Ensure the data directory exists."""
     Path(DATA_DIR).mkdir(parents=True, exist_ok=True)
 
 
-def get_conversation_path(conversation_id: str) -> str:
-    """Get the file path for a conversation."""
+def get_conversation_dir(conversation_id: str) -> str:
+    """Get the directory holding a conversation's meta and message log."""
+    return os.path.join(DATA_DIR, conversation_id)
+
+
+def _legacy_conversation_path(conversation_id: str) -> str:
+    """Get the path of a conversation stored in the single-file layout."""
     return os.path.join(DATA_DIR, f"{conversation_id}.json")
 
 
+def _meta_path(conversation_id: str) -> str:
+    return os.path.join(get_conversation_dir(conversation_id), _META_FILE)
+
+
+def _messages_path(conversation_id: str) -> str:
+    return os.path.join(get_conversation_dir(conversation_id), _MESSAGES_FILE)
+
+
+def _encode_message(message: Dict[str, Any]) -> bytes:
+    """Serialize a message as a single newline-terminated JSON line."""
+    return json.dumps(message).encode() + b"\n"
+
+
+def _write_atomic(path: str, data: bytes):
+    """
+    Write bytes to a file atomically.
+
+    Writes to a temp file first, then uses os.replace() for crash safety.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        # Clean up temp file on failure
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _write_meta(meta: Dict[str, Any]):
+    _write_atomic(_meta_path(meta["id"]), json.dumps(meta, indent=2).encode())
+
+
+def _read_meta(conversation_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_meta_path(conversation_id), 'rb') as f:
+            return json.loads(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def _read_messages(conversation_id: str) -> List[Dict[str, Any]]:
+    """
+    Read a conversation's message log.
+
+    Consecutive lines with the same job_id are versions of one assistant
+    message, so only the last is kept. A torn final line (crash or
+    concurrent write during an append) is skipped.
+    """
+    messages = []
+    try:
+        with open(_messages_path(conversation_id), 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                job_id = message.get("job_id")
+                if job_id is not None and messages and messages[-1].get("job_id") == job_id:
+                    messages[-1] = message
+                else:
+                    messages.append(message)
+    except FileNotFoundError:
+        pass
+    return messages
+
+
+def _last_line_offset(f, end: int) -> int:
+    """
+    Find the byte offset where the last line of a file begins.
+
+    Scans backwards from the end in blocks, so the cost is proportional to
+    the length of the last line rather than the whole file.
+
+    Args:
+        f: File opened in binary mode
+        end: File size; the byte at end - 1 is the last line's newline
+
+    Returns:
+        Offset of the first byte of the last line
+    """
+    pos = end - 1
+    while pos > 0:
+        start = max(0, pos - _TAIL_READ_BLOCK)
+        f.seek(start)
+        newline = f.read(pos - start).rfind(b"\n")
+        if newline != -1:
+            return start + newline + 1
+        pos = start
+    return 0
+
+
+@_serialized
+def _migrate_legacy(conversation_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Ensure a conversation is stored in the directory layout.
+
+    Returns:
+        The conversation's meta dict, or None if the conversation doesn't exist
+    """
+    meta = _read_meta(conversation_id)
+    if meta is not None:
+        return meta
+
+    path = _legacy_conversation_path(conversation_id)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r') as f:
+        save_conversation(json.load(f))
+    return _read_meta(conversation_id)
+
+
+@_serialized
 def create_conversation(conversation_id: str) -> Dict[str, Any]:
     """
     Create a new conversation.
@@ -38,10 +199,7 @@ def create_conversation(conversation_id: str) -> Dict[str, Any]:
         "messages": []
     }
 
-    # Save to file
-    path = get_conversation_path(conversation_id)
-    with open(path, 'w') as f:
-        json.dump(conversation, f, indent=2)
+    save_conversation(conversation)
 
     return conversation
 
@@ -56,37 +214,49 @@ def get_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Conversation dict or None if not found
     """
-    path = get_conversation_path(conversation_id)
-
-    if not os.path.exists(path):
-        return None
-
-    with open(path, 'r') as f:
-        return json.load(f)
+    meta = _read_meta(conversation_id)
+    if meta is None:
+        path = _legacy_conversation_path(conversation_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    return {
+        "id": meta["id"],
+        "created_at": meta["created_at"],
+        "title": meta.get("title", "New Conversation"),
+        "messages": _read_messages(conversation_id),
+    }
 
 
+@_serialized
 def save_conversation(conversation: Dict[str, Any]):
     """
-    Save a conversation to storage atomically.
+    Save a full conversation to storage, rewriting its message log.
 
-    Writes to a temp file first, then uses os.replace() for crash safety.
+    Both files are replaced atomically. A legacy single-file copy of the
+    conversation is removed once the new layout has been written.
     """
-    ensure_data_dir()
+    conversation_id = conversation['id']
+    Path(get_conversation_dir(conversation_id)).mkdir(parents=True, exist_ok=True)
+
+    messages = conversation["messages"]
+    _write_atomic(
+        _messages_path(conversation_id),
+        b"".join(_encode_message(msg) for msg in messages),
+    )
+    _write_meta({
+        "id": conversation_id,
+        "created_at": conversation["created_at"],
+        "title": conversation.get("title", "New Conversation"),
+        "message_count": len(messages),
+    })
 
-    path = get_conversation_path(conversation['id'])
-    dir_name = os.path.dirname(path)
-    fd, tmp_path = tempfile.mkstemp(dir=dir_name, suffix='.tmp')
     try:
-        with os.fdopen(fd, 'w') as f:
-            json.dump(conversation, f, indent=2)
-        os.replace(tmp_path, path)
-    except Exception:
-        # Clean up temp file on failure
-        try:
-            os.unlink(tmp_path)
-        except OSError:
-            pass
-        raise
+        os.remove(_legacy_conversation_path(conversation_id))
+    except FileNotFoundError:
+        pass
 
 
 def list_conversations() -> List[Dict[str, Any]]:
@@ -99,10 +269,13 @@ def list_conversations() -> List[Dict[str, Any]]:
     ensure_data_dir()
 
     conversations = []
-    for filename in os.listdir(DATA_DIR):
-        if filename.endswith('.json'):
-            path = os.path.join(DATA_DIR, filename)
-            with open(path, 'r') as f:
+    for entry in os.scandir(DATA_DIR):
+        if entry.is_dir():
+            meta = _read_meta(entry.name)
+            if meta is not None:
+                conversations.append(meta)
+        elif entry.name.endswith('.json'):
+            with open(entry.path, 'r') as f:
                 data = json.load(f)
                 # Return metadata only
                 conversations.append({
@@ -118,6 +291,25 @@ def list_conversations() -> List[Dict[str, Any]]:
     return conversations
 
 
+@_serialized
+def _append_message(conversation_id: str, message: Dict[str, Any]):
+    """
+    Append a message to a conversation's log and bump its message count.
+
+    Raises:
+        ValueError: If the conversation doesn't exist
+    """
+    meta = _migrate_legacy(conversation_id)
+    if meta is None:
+        raise ValueError(f"Conversation {conversation_id} not found")
+
+    with open(_messages_path(conversation_id), 'ab') as f:
+        f.write(_encode_message(message))
+
+    meta["message_count"] = meta.get("message_count", 0) + 1
+    _write_meta(meta)
+
+
 def add_user_message(conversation_id: str, content: str):
     """
     Add a user message to a conversation.
@@ -126,17 +318,11 @@ def add_user_message(conversation_id: str, content: str):
         conversation_id: Conversation identifier
         content: User message content
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
-
-    conversation["messages"].append({
+    _append_message(conversation_id, {
         "role": "user",
         "content": content
     })
 
-    save_conversation(conversation)
-
 
 def add_assistant_message(
     conversation_id: str,
@@ -153,20 +339,15 @@ def add_assistant_message(
         stage2: List of model rankings
         stage3: Final synthesized response
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
-
-    conversation["messages"].append({
+    _append_message(conversation_id, {
         "role": "assistant",
         "stage1": stage1,
         "stage2": stage2,
         "stage3": stage3
     })
 
-    save_conversation(conversation)
-
 
+@_serialized
 def update_conversation_title(conversation_id: str, title: str):
     """
     Update the title of a conversation.
@@ -175,14 +356,15 @@ def update_conversation_title(conversation_id: str, title: str):
         conversation_id: Conversation identifier
         title: New title for the conversation
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
+    meta = _migrate_legacy(conversation_id)
+    if meta is None:
         raise ValueError(f"Conversation {conversation_id} not found")
 
-    conversation["title"] = title
-    save_conversation(conversation)
+    meta["title"] = title
+    _write_meta(meta)
 
 
+@_serialized
 def upsert_assistant_message(
     conversation_id: str,
     job_id: str,
@@ -196,10 +378,13 @@ def upsert_assistant_message(
     Insert or update an assistant message identified by job_id.
 
     First call (no existing message with this job_id) appends a new message.
-    Subsequent calls update the same message in-place.
+    Subsequent calls update the same message. The message being updated is
+    normally the last one in the log, so the new version is appended as a
+    superseding line; otherwise the full conversation is rewritten. Once the
+    status is terminal the superseded lines are compacted away.
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
+    meta = _migrate_legacy(conversation_id)
+    if meta is None:
         raise ValueError(f"Conversation {conversation_id} not found")
 
     # Build the message dict
@@ -213,20 +398,43 @@ def upsert_assistant_message(
         "metadata": metadata,
     }
 
-    # Try to find existing message with this job_id
-    found = False
+    torn = superseded = False
+    with open(_messages_path(conversation_id), 'r+b') as f:
+        end = f.seek(0, os.SEEK_END)
+        if end:
+            f.seek(_last_line_offset(f, end))
+            tail = f.read()
+            try:
+                last = json.loads(tail) if tail.endswith(b"\n") else None
+            except json.JSONDecodeError:
+                last = None
+            torn = last is None
+            if isinstance(last, dict) and last.get("job_id") == job_id:
+                f.write(_encode_message(msg_data))
+                superseded = True
+
+    if superseded:
+        if status in _TERMINAL_STATUSES:
+            save_conversation(get_conversation(conversation_id))
+        return
+
+    # Try to find an earlier message with this job_id
+    conversation = get_conversation(conversation_id)
     for i, msg in enumerate(conversation["messages"]):
         if msg.get("job_id") == job_id:
             conversation["messages"][i] = msg_data
-            found = True
-            break
+            save_conversation(conversation)
+            return
 
-    if not found:
+    if torn:
+        # Appending after a torn line would hide the new message from readers
         conversation["messages"].append(msg_data)
-
-    save_conversation(conversation)
+        save_conversation(conversation)
+    else:
+        _append_message(conversation_id, msg_data)
 
 
+@_serialized
 def delete_conversation(conversation_id: str) -> bool:
     """
     Delete a conversation.
@@ -237,8 +445,14 @@ def delete_conversation(conversation_id: str) -> bool:
     Returns:
         True if deleted, False if not found
     """
-    path = get_conversation_path(conversation_id)
+    deleted = False
+    conversation_dir = get_conversation_dir(conversation_id)
+    if os.path.isfile(_meta_path(conversation_id)):
+        shutil.rmtree(conversation_dir)
+        deleted = True
+
+    path = _legacy_conversation_path(conversation_id)
     if os.path.exists(path):
         os.remove(path)
-        return True
-    return False
+        deleted = True
+    return deleted
@@ -87,10 +87,14 @@ function App() {
       case 'stage1_init':
         updateLastAssistant((msg) => {
           const stage1 = msg.stage1 || [];
-          if (stage1.find((r) => r.model === event.data.model)) return msg;
+          // On a replay from the start the stored response is already here;
+          // reset it so the replayed chunks don't append to it a second time
+          const exists = stage1.some((r) => r.model === event.data.model);
           return {
             ...msg,
-            stage1: [...stage1, event.data],
+            stage1: exists
+              ? stage1.map((r) => (r.model === event.data.model ? event.data : r))
+              : [...stage1, event.data],
             loading: { ...msg.loading, stage1: false },
           };
         });
@@ -111,9 +115,9 @@ function App() {
         break;
 
       case 'stage1_complete':
+        // Responses were already assembled from stage1_chunk events
         updateLastAssistant((msg) => ({
           ...msg,
-          stage1: event.data,
           loading: { ...msg.loading, stage1: false },
         }));
         break;
@@ -135,10 +139,13 @@ function App() {
       case 'stage2_init':
         updateLastAssistant((msg) => {
           const stage2 = msg.stage2 || [];
-          if (stage2.find((r) => r.model === event.data.model)) return msg;
+          // Same replay reset as stage1_init
+          const exists = stage2.some((r) => r.model === event.data.model);
           return {
             ...msg,
-            stage2: [...stage2, event.data],
+            stage2: exists
+              ? stage2.map((r) => (r.model === event.data.model ? event.data : r))
+              : [...stage2, event.data],
             loading: { ...msg.loading, stage2: false },
           };
         });
@@ -159,10 +166,11 @@ function App() {
         break;
 
       case 'stage2_complete':
+        // Rankings were already assembled from stage2_chunk events and
+        // label_to_model arrived with stage2_map
         updateLastAssistant((msg) => ({
           ...msg,
-          stage2: event.data,
-          metadata: event.metadata,
+          metadata: { ...(msg.metadata || {}), ...event.metadata },
           loading: { ...msg.loading, stage2: false },
         }));
         break;
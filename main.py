@@ -1,7 +1,15 @@
 import importlib.util
+import torch
 from huggingface_hub import hf_hub_download
 from sentence_transformers import CrossEncoder
 
+# Half precision halves weight/activation traffic on GPU; CPU stays float32
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+DTYPE = torch.float16 if DEVICE == "cuda" else torch.float32
+MAX_LENGTH = 512
+# Pairs per forward pass; one predict call scores every candidate for a query
+BATCH_SIZE = 64
+
 def patch_zeranker():
     path = hf_hub_download("zeroentropy/zerank-2", "modeling_zeranker.py", revision="main")
     spec = importlib.util.spec_from_file_location("modeling_zeranker", path)
@@ -10,5 +18,16 @@ def patch_zeranker():
     return mod
 
 patch_zeranker()  # patches CrossEncoder.predict
-ce = CrossEncoder("zeroentropy/zerank-2", trust_remote_code=True)
-print(ce.predict([("What is 2+2?", 4), ("What is 2+2?", "1 million")]))
\ No newline at end of file
+ce = CrossEncoder(
+    "zeroentropy/zerank-2",
+    trust_remote_code=True,
+    device=DEVICE,
+    max_length=MAX_LENGTH,
+    model_kwargs={"torch_dtype": DTYPE},
+)
+ce.predict([("warm up", "warm up")])  # pay one-time load/kernel setup before real queries
+
+def rerank(query, documents):
+    return ce.predict([(query, doc) for doc in documents], batch_size=BATCH_SIZE)
+
+print(rerank("What is 2+2?", [4, "1 million"]))